@@ -21,28 +21,44 @@ Versione: 4.1.0
 import utils.http_config  # noqa: F401 - patches requests on import
 
 import streamlit as st
+import numpy as np
 import pandas as pd
+import xlsxwriter
 from datetime import datetime
+import hashlib
 import logging
+import re
 import sys
 from pathlib import Path
 from io import BytesIO
-from typing import List, Optional
+from typing import Any, Callable, List, Optional, Tuple
 
 # Aggiungi la directory corrente al path per gli import
 sys.path.insert(0, str(Path(__file__).parent))
 
 from config import (
+    DEFAULT_COMPARISON_INDEX,
+    DEFAULT_SORT_INDEX,
+    DEFAULT_SORT_PERIOD,
     PERFORMANCE_PERIODS,
+    PERFORMANCE_PERIOD_LABELS,
     config,
 )
-from core.models import UniverseInstrument
+from core.models import UniverseInstrument, UniverseLoadResult
 from core.universe_loader import (
+    PERIOD_INDEX,
+    UniverseArrays,
     UniverseLoader,
-    group_by_category,
-    rank_by_performance,
+    category_groups,
+    rank_indices_by_performance,
+)
+from core.etf_benchmark import (
+    build_universe_index,
+    find_etf_in_cache,
+    get_etf_benchmark,
+    get_etf_cache_status,
+    preload_etf_list,
 )
-from core.etf_benchmark import get_etf_benchmark, get_etf_cache_status, preload_etf_list
 from core.comparison_calculator import compare_universe_vs_etf
 from utils.logger import setup_logging
 
@@ -71,31 +87,39 @@ st.set_page_config(
 # ============================================================================
 
 def init_session_state():
-    """Inizializza le variabili di session state."""
+    """Inizializza le variabili di session state (una sola volta per sessione)."""
+    if '_state_initialized' in st.session_state:
+        return
+
     defaults = {
         # Stato universo
         'universe_loaded': False,
         'universe_instruments': [],
         'universe_load_result': None,
         'universe_filename': None,
+        'universe_file_id': None,
+        'universe_file_sig': None,
+        'universe_arrays': None,
+        'universe_index': {},
+        'available_categories': [],
+        'available_sfdr': [],
         # Stato filtri e risultati
         'filtered_instruments': [],
+        'filtered_arrays': None,
         'filter_applied': False,
         # Stato confronto ETF
         'comparison_report': None,
+        'comparison_df': None,
+        'comparison_key': None,
         'comparison_done': False,
-        # Modalita' attiva
-        'active_mode': 'esplora',
-        # Stato database ETF (per pre-caricamento)
-        'etf_db_ready': False,
-        'etf_db_loaded_at': None,
-        'etf_db_count': 0,
     }
 
     for key, default_value in defaults.items():
         if key not in st.session_state:
             st.session_state[key] = default_value
 
+    st.session_state._state_initialized = True
+
 
 init_session_state()
 
@@ -110,281 +134,644 @@ def get_universe_loader():
     return UniverseLoader()
 
 
-def load_universe(uploaded_file):
+def uploaded_file_signature(uploaded_file) -> str:
+    """
+    Impronta del contenuto del file caricato (BLAKE2b a 128 bit).
+
+    Calcolata sul buffer condiviso, senza copiare i byte; serve a non
+    ricaricare lo stesso file ricaricato dall'utente (file_id diverso,
+    contenuto identico).
+    """
+    # La view va rilasciata subito: finché esiste, il BytesIO non può essere
+    # ridimensionato né chiuso (BufferError)
+    with uploaded_file.getbuffer() as view:
+        return hashlib.blake2b(view, digest_size=16).hexdigest()
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def cached_universe_load(
+    file_sig: str,
+    filename: str,
+    _uploaded_file
+) -> Tuple[UniverseLoadResult, UniverseArrays]:
+    """
+    Parsing del file e vista colonnare, in cache per impronta del contenuto.
+
+    La cache è condivisa tra le sessioni: riaprire l'app o ricaricare lo
+    stesso file non ripete il parsing dell'Excel, che è il passo più lento.
+    """
+    loader = get_universe_loader()
+    # UploadedFile è già un BytesIO: lo si passa al loader senza copiarne i byte
+    result = loader.load(_uploaded_file, filename)
+    # Vista colonnare costruita una volta sola, condivisa da universo e
+    # filtrati finché non si applicano filtri
+    return result, UniverseArrays.from_instruments(result.instruments)
+
+
+def load_universe(uploaded_file, file_sig: str):
     """Carica l'universo fondi da file Excel."""
     try:
-        loader = get_universe_loader()
-        file_bytes = BytesIO(uploaded_file.getvalue())
-        result = loader.load(file_bytes, uploaded_file.name)
-
-        st.session_state.universe_load_result = result
-        st.session_state.universe_instruments = result.instruments
-        st.session_state.universe_loaded = result.success or result.valid_count > 0
-        st.session_state.universe_filename = uploaded_file.name
-        st.session_state.filtered_instruments = result.instruments
-        st.session_state.filter_applied = False
-        st.session_state.comparison_report = None
-        st.session_state.comparison_done = False
+        result, arrays = cached_universe_load(
+            file_sig, uploaded_file.name, uploaded_file
+        )
+
+        # Aggiornamento di stato in un'unica scrittura
+        st.session_state.update({
+            'universe_load_result': result,
+            'universe_instruments': result.instruments,
+            'universe_arrays': arrays,
+            # Indice ISIN (già maiuscoli dal loader) -> strumento, per lookup
+            # O(1) nel confronto invece della scansione dell'universo
+            'universe_index': build_universe_index(result.instruments),
+            # Opzioni dei filtri: cambiano solo con un nuovo upload
+            'available_categories': get_unique_categories(result.instruments, arrays),
+            'available_sfdr': get_unique_sfdr_categories(result.instruments, arrays),
+            'universe_loaded': result.success or result.valid_count > 0,
+            'universe_filename': uploaded_file.name,
+            'filtered_instruments': result.instruments,
+            'filtered_arrays': arrays,
+            'filter_applied': False,
+            'comparison_report': None,
+            'comparison_df': None,
+            'comparison_done': False,
+        })
 
         logger.info(f"Universe loaded: {result.valid_count} instruments")
         return result
 
     except Exception as e:
         logger.error(f"Universe load failed: {e}")
-        st.session_state.universe_loaded = False
-        st.session_state.universe_instruments = []
+        st.session_state.update({
+            'universe_loaded': False,
+            'universe_instruments': [],
+            'universe_arrays': None,
+            'universe_index': {},
+            'available_categories': [],
+            'available_sfdr': [],
+            'universe_load_result': None,
+        })
         return None
 
 
-def universe_to_dataframe(instruments: List[UniverseInstrument]) -> pd.DataFrame:
-    """Converte lista di UniverseInstrument in DataFrame per visualizzazione."""
-    if not instruments:
-        return pd.DataFrame()
+# Separatori ammessi nella lista ISIN da pre-caricare (virgole e spazi/newline)
+ISIN_SPLIT_RE = re.compile(r'[,\s]+')
 
-    data = []
-    for inst in instruments:
-        row = {
-            "Nome": inst.name or inst.isin,
-            "ISIN": inst.isin,
-            "Cat. Morningstar": inst.category_morningstar or "",
-            "Cat. SFDR": inst.category_sfdr or "",
-        }
-
-        # Performance (converti da decimale a percentuale)
-        if inst.perf_ytd is not None:
-            row["Perf. YTD"] = f"{inst.perf_ytd * 100:.2f}%"
-        else:
-            row["Perf. YTD"] = ""
 
-        if inst.perf_1m is not None:
-            row["Perf. 1m"] = f"{inst.perf_1m * 100:.2f}%"
-        else:
-            row["Perf. 1m"] = ""
-
-        if inst.perf_3m is not None:
-            row["Perf. 3m"] = f"{inst.perf_3m * 100:.2f}%"
-        else:
-            row["Perf. 3m"] = ""
+# Colonne percentuali della tabella fondi: (intestazione, attributo)
+UNIVERSE_PERCENT_COLUMNS = (
+    ("Perf. YTD", "ytd"),
+    ("Perf. 1m", "1m"),
+    ("Perf. 3m", "3m"),
+    ("Perf. 6m", "6m"),
+    ("Perf. 1a", "1y"),
+    ("Perf. 3a", "3y"),
+    ("Perf. 5a", "5y"),
+    ("Perf. 7a", "7y"),
+    ("Perf. 9a", "9y"),
+    ("Perf. 10a", "10y"),
+)
+UNIVERSE_PERCENT_HEADERS = tuple(
+    [header for header, _ in UNIVERSE_PERCENT_COLUMNS] + ["TER", "VaR 3m"]
+)
 
-        if inst.perf_6m is not None:
-            row["Perf. 6m"] = f"{inst.perf_6m * 100:.2f}%"
-        else:
-            row["Perf. 6m"] = ""
 
-        if inst.perf_1y is not None:
-            row["Perf. 1a"] = f"{inst.perf_1y * 100:.2f}%"
-        else:
-            row["Perf. 1a"] = ""
+def universe_to_dataframe(arrays: UniverseArrays) -> pd.DataFrame:
+    """
+    Converte la vista colonnare dei fondi in DataFrame per visualizzazione.
+
+    Le colonne sono prese direttamente dagli array di UniverseArrays,
+    senza ripercorrere gli oggetti. Le colonne percentuali restano
+    numeriche (valori x100, NaN se mancanti): il formato "x.xx%" è
+    applicato in visualizzazione tramite column_config e nell'export
+    tramite il formato numerico della colonna, così l'ordinamento in
+    tabella resta numerico.
+    """
+    if not len(arrays):
+        return pd.DataFrame()
 
-        if inst.perf_3y is not None:
-            row["Perf. 3a"] = f"{inst.perf_3y * 100:.2f}%"
-        else:
-            row["Perf. 3a"] = ""
+    columns = {
+        "Nome": arrays.name,
+        "ISIN": arrays.isin.astype(object),
+        # Categorie ripetitive: dtype category (codifica a dizionario in Arrow)
+        "Cat. Morningstar": arrays.category.remove_unused_categories(),
+        "Cat. SFDR": arrays.sfdr.remove_unused_categories(),
+    }
 
-        if inst.perf_5y is not None:
-            row["Perf. 5a"] = f"{inst.perf_5y * 100:.2f}%"
-        else:
-            row["Perf. 5a"] = ""
+    # Percentuali da decimale a x100 in un'unica moltiplicazione
+    percents = arrays.performance * 100
+    for header, period in UNIVERSE_PERCENT_COLUMNS:
+        columns[header] = percents[:, PERIOD_INDEX[period]]
+    columns["TER"] = arrays.ter * 100
+    columns["VaR 3m"] = arrays.var_3m * 100
 
-        if inst.perf_7y is not None:
-            row["Perf. 7a"] = f"{inst.perf_7y * 100:.2f}%"
-        else:
-            row["Perf. 7a"] = ""
+    return pd.DataFrame(columns)
 
-        if inst.perf_9y is not None:
-            row["Perf. 9a"] = f"{inst.perf_9y * 100:.2f}%"
-        else:
-            row["Perf. 9a"] = ""
 
-        if inst.perf_10y is not None:
-            row["Perf. 10a"] = f"{inst.perf_10y * 100:.2f}%"
-        else:
-            row["Perf. 10a"] = ""
+def universe_to_excel(arrays: UniverseArrays) -> bytes:
+    """
+    Esporta i fondi (vista colonnare) in formato Excel.
 
-        if inst.ter is not None:
-            row["TER"] = f"{inst.ter * 100:.2f}%"
-        else:
-            row["TER"] = ""
+    Scrive direttamente con xlsxwriter in modalità constant_memory: le righe
+    vengono emesse in ordine e scaricate su disco senza costruire l'albero
+    di celle in memoria. Le percentuali sono scritte come numeri con un
+    formato di colonna (nessuna formattazione in Python); le larghezze
+    delle colonne testuali sono calcolate in una sola passata.
+    """
+    df = universe_to_dataframe(arrays)
+    headers = list(df.columns)
+    percent_headers = set(UNIVERSE_PERCENT_HEADERS)
+
+    columns = []
+    for col in headers:
+        values = df[col].to_numpy(dtype=object)
+        if col in percent_headers:
+            # None -> cella vuota (xlsxwriter non accetta NaN)
+            values[pd.isna(values)] = None
+        columns.append(values)
 
-        if inst.var_3m is not None:
-            row["VaR 3m"] = f"{inst.var_3m * 100:.2f}%"
-        else:
-            row["VaR 3m"] = ""
+    output = BytesIO()
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    worksheet = workbook.add_worksheet('Fondi')
+    header_format = workbook.add_format(
+        {'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'}
+    )
+    percent_format = workbook.add_format({'num_format': '0.00"%"'})
+
+    # Auto-adjust column widths (prima delle righe: in constant_memory
+    # set_column va chiamato prima di scrivere i dati)
+    for idx, (col, values) in enumerate(zip(headers, columns)):
+        if col in percent_headers:
+            # Larghezza fissa sufficiente per "-100.00%"
+            worksheet.set_column(idx, idx, max(len(col), 10) + 2, percent_format)
+            continue
+        max_length = max(max(map(len, values), default=0), len(col)) + 2
+        worksheet.set_column(idx, idx, min(max_length, 50))
+
+    worksheet.write_row(0, 0, headers, header_format)
+    for row_idx, row in enumerate(zip(*columns), start=1):
+        worksheet.write_row(row_idx, 0, row)
+
+    workbook.close()
+    return output.getvalue()
 
-        data.append(row)
 
-    return pd.DataFrame(data)
+def comparison_to_excel(report) -> bytes:
+    """
+    Esporta risultati confronto in formato Excel.
 
+    Stessa scrittura in streaming di universe_to_excel (xlsxwriter,
+    constant_memory); le larghezze sono impostate per indice di colonna.
+    """
+    headers = (
+        "Nome", "ISIN", "Categoria", f"Perf. {report.period_label}",
+        "Delta vs ETF", "Status",
+    )
 
-def universe_to_excel(instruments: List[UniverseInstrument]) -> bytes:
-    """Esporta lista di strumenti in formato Excel."""
-    df = universe_to_dataframe(instruments)
+    # Prima riga: ETF benchmark; poi i risultati ordinati, come tuple
+    # nell'ordine delle intestazioni (nessun dizionario per riga)
+    etf = report.etf_benchmark
+    etf_perf = report.etf_performance
+    rows = [(
+        f"[BENCHMARK] {etf.name or etf.isin}",
+        etf.isin,
+        etf.category_morningstar or "",
+        f"{etf_perf * 100:.2f}%" if etf_perf else "N/A",
+        "BENCHMARK",
+        "🎯 BENCHMARK",
+    )]
+    rows.extend(
+        (
+            r.instrument.name or r.instrument.isin,
+            r.instrument.isin,
+            r.instrument.category_morningstar or "",
+            f"{r.fund_performance * 100:.2f}%" if r.fund_performance else "N/A",
+            f"{r.delta * 100:+.2f}%" if r.delta else "N/A",
+            r.status_emoji,
+        )
+        for r in report.get_sorted_results()
+    )
 
     output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='Fondi', index=False)
-
-        # Auto-adjust column widths
-        worksheet = writer.sheets['Fondi']
-        for idx, col in enumerate(df.columns):
-            max_length = max(
-                df[col].astype(str).str.len().max(),
-                len(col)
-            ) + 2
-            worksheet.column_dimensions[chr(65 + idx)].width = min(max_length, 50)
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    worksheet = workbook.add_worksheet('Confronto ETF')
+    header_format = workbook.add_format(
+        {'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'}
+    )
 
+    # Auto-adjust column widths per indice (set_column), prima delle righe
+    # (una sola trasposizione delle righe, poi len in C per colonna)
+    for idx, (col, values) in enumerate(zip(headers, zip(*rows))):
+        max_length = max(max(map(len, values)), len(col)) + 2
+        worksheet.set_column(idx, idx, min(max_length, 50))
+
+    worksheet.write_row(0, 0, headers, header_format)
+    for row_idx, row in enumerate(rows, start=1):
+        worksheet.write_row(row_idx, 0, row)
+
+    workbook.close()
     return output.getvalue()
 
 
-def comparison_to_excel(report) -> bytes:
-    """Esporta risultati confronto in formato Excel."""
-    data = []
+def universe_arrays_digest(arrays: UniverseArrays) -> str:
+    """
+    Digest SHA-256 dei valori della vista colonnare, nell'ordine delle righe.
+
+    Copre ISIN, nomi, categorie e colonne numeriche: elenchi con gli stessi
+    ISIN ma performance, TER o categorie diverse hanno digest diversi. Le
+    colonne a dtype fisso entrano come byte dell'array, senza oggetti per riga.
+    """
+    digest = hashlib.sha256()
+    for column in (arrays.isin, arrays.performance, arrays.ter, arrays.var_3m):
+        digest.update(np.ascontiguousarray(column).tobytes())
+    # Stringhe separate da caratteri di controllo, assenti nei dati
+    digest.update(b"\x1e" + "\x1f".join(arrays.name.tolist()).encode())
+    for column in (arrays.category, arrays.sfdr):
+        digest.update(b"\x1e" + "\x1f".join(column.categories).encode())
+        digest.update(column.codes.tobytes())
+    return digest.hexdigest()
+
+
+def displayed_cache_key(arrays: UniverseArrays) -> tuple:
+    """
+    Chiave hashable per le cache di visualizzazione/export dei fondi mostrati.
 
-    # Prima riga: ETF benchmark
+    Le cache st.cache_data sono condivise tra le sessioni: la chiave
+    dipende solo dal contenuto, cioè dall'impronta del file caricato
+    (universe_file_sig) e dal digest dei valori mostrati. Streamlit hasha
+    una stringa corta invece della lista di oggetti, e la chiave resta
+    stabile tra processi (a differenza di hash()).
+    """
+    file_sig = st.session_state.universe_file_sig
+    # La vista colonnare non viene mai modificata in place (upload e filtri
+    # ne creano una nuova): per la stessa vista e la stessa impronta si
+    # riusa la chiave già calcolata, senza ricalcolare il digest. Il memo
+    # tiene un riferimento alla vista, quindi il suo id() non può essere
+    # riciclato.
+    memo = st.session_state.get('_displayed_key_memo')
+    if memo is not None and memo[0] is arrays and memo[1][0] == file_sig:
+        return memo[1]
+
+    key = (file_sig, len(arrays), universe_arrays_digest(arrays))
+    st.session_state['_displayed_key_memo'] = (arrays, key)
+    return key
+
+
+def session_memo(name: str, cache_key: tuple, compute: Callable[[], Any]) -> Any:
+    """
+    Ultimo valore calcolato per cache_key, tenuto in session_state.
+
+    Davanti alle funzioni st.cache_data, che a ogni rerun hashano gli
+    argomenti e restituiscono una copia deserializzata del risultato: finché
+    la chiave non cambia si riusa lo stesso oggetto con un solo confronto.
+    """
+    memo = st.session_state.get(name)
+    if memo is not None and memo[0] == cache_key:
+        return memo[1]
+    value = compute()
+    st.session_state[name] = (cache_key, value)
+    return value
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def cached_universe_dataframe(
+    cache_key: tuple,
+    _arrays: UniverseArrays
+) -> pd.DataFrame:
+    """DataFrame di visualizzazione, ricalcolato solo se cambia cache_key."""
+    return universe_to_dataframe(_arrays)
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def cached_universe_excel(
+    cache_key: tuple,
+    _arrays: UniverseArrays
+) -> bytes:
+    """Bytes Excel per il download, rigenerati solo se cambia cache_key."""
+    return universe_to_excel(_arrays)
+
+
+# Etichette di stato della tabella confronto, nell'ordine dei codici usati
+# in comparison_to_dataframe (benchmark, batte, non batte, N/A)
+COMPARISON_STATUS_LABELS = ("🎯 BENCHMARK", "✅ BATTE", "❌ NON BATTE", "⚪ N/A")
+
+
+def comparison_to_dataframe(report) -> pd.DataFrame:
+    """
+    Tabella di visualizzazione del confronto: ETF in testa, poi i fondi ordinati.
+
+    Performance e delta restano numerici (float64, in percentuale, NaN se
+    assenti); il formato percentuale è applicato da column_config in
+    visualizzazione. Lo status è derivato dal segno del delta con
+    un'unica selezione vettoriale e costruito come Categorical dai codici,
+    senza una stringa per riga.
+    """
     etf = report.etf_benchmark
     etf_perf = report.etf_performance
-    data.append({
-        "Nome": f"[BENCHMARK] {etf.name or etf.isin}",
-        "ISIN": etf.isin,
-        "Categoria": etf.category_morningstar or "",
-        f"Perf. {report.period_label}": f"{etf_perf * 100:.2f}%" if etf_perf else "N/A",
-        "Delta vs ETF": "BENCHMARK",
-        "Status": "🎯 BENCHMARK"
+    results = report.get_sorted_results()
+
+    # Costruzione per colonne: prima riga ETF benchmark, poi i risultati ordinati
+    names = [f"🎯 {etf.name or etf.isin}"]
+    names.extend([r.instrument.name or r.instrument.isin for r in results])
+    isins = [etf.isin]
+    isins.extend([r.instrument.isin for r in results])
+    categories = [etf.category_morningstar or "-"]
+    categories.extend([r.instrument.category_morningstar or "" for r in results])
+
+    # None -> NaN nella conversione a float64
+    perfs = np.array(
+        [etf_perf] + [r.fund_performance for r in results], dtype=np.float64
+    ) * 100
+    deltas = np.array(
+        [None] + [r.delta for r in results], dtype=np.float64
+    ) * 100
+
+    # Codici di COMPARISON_STATUS_LABELS: 1 batte, 2 non batte, 3 senza delta
+    status_codes = np.select([np.isnan(deltas), deltas > 0], [3, 1], 2)
+    status_codes[0] = 0
+
+    return pd.DataFrame({
+        "Nome": names,
+        "ISIN": isins,
+        "Categoria": categories,
+        f"Perf. {report.period_label}": perfs,
+        "Delta vs ETF": deltas,
+        "Status": pd.Categorical.from_codes(
+            status_codes, categories=COMPARISON_STATUS_LABELS
+        ),
     })
 
-    # Risultati ordinati
-    for r in report.get_sorted_results():
-        row = {
-            "Nome": r.instrument.name or r.instrument.isin,
-            "ISIN": r.instrument.isin,
-            "Categoria": r.instrument.category_morningstar or "",
-            f"Perf. {report.period_label}": f"{r.fund_performance * 100:.2f}%" if r.fund_performance else "N/A",
-            "Delta vs ETF": f"{r.delta * 100:+.2f}%" if r.delta else "N/A",
-            "Status": r.status_emoji
-        }
-        data.append(row)
 
-    df = pd.DataFrame(data)
+@st.cache_data(show_spinner=False, max_entries=8)
+def cached_comparison(
+    cache_key: tuple,
+    _instruments: List[UniverseInstrument],
+    _etf: UniverseInstrument,
+    period: str,
+    period_label: str,
+    _arrays: Optional[UniverseArrays] = None
+) -> tuple:
+    """
+    Confronto fondi vs ETF e relativa tabella, ricalcolati solo se cambiano
+    fondi visualizzati, ETF o periodo (cache_key).
 
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, sheet_name='Confronto ETF', index=False)
-
-        # Auto-adjust column widths
-        worksheet = writer.sheets['Confronto ETF']
-        for idx, col in enumerate(df.columns):
-            max_length = max(
-                df[col].astype(str).str.len().max(),
-                len(col)
-            ) + 2
-            worksheet.column_dimensions[chr(65 + idx)].width = min(max_length, 50)
+    Returns:
+        Tupla (ComparisonReport, DataFrame di visualizzazione)
+    """
+    report = compare_universe_vs_etf(
+        _instruments, _etf, period, period_label, _arrays
+    )
+    return report, comparison_to_dataframe(report)
 
-    return output.getvalue()
 
+@st.cache_data(show_spinner=False, max_entries=4)
+def cached_comparison_excel(cache_key: tuple, _report) -> bytes:
+    """Bytes Excel del confronto, rigenerati solo se cambia cache_key."""
+    return comparison_to_excel(_report)
 
-def get_unique_categories(instruments: List[UniverseInstrument]) -> List[str]:
+
+def performance_summary(
+    arrays: UniverseArrays,
+    period: str
+) -> Tuple[Optional[float], Optional[float]]:
+    """
+    Calcola media e migliore performance nel periodo.
+
+    La colonna del periodo nella vista colonnare è già un array float64
+    (NaN per i dati mancanti): nessun oggetto da visitare, media e massimo
+    girano in C.
+
+    Returns:
+        Tupla (media, migliore) in decimale, None se nessun dato
+    """
+    perfs = arrays.period(period)
+    valid = perfs[~np.isnan(perfs)]
+    if valid.size == 0:
+        return None, None
+    return float(valid.mean()), float(valid.max())
+
+
+def grouped_mean_max(
+    group_ids: np.ndarray,
+    values: np.ndarray,
+    n_groups: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Media e massimo per gruppo ignorando i NaN (NaN se il gruppo è vuoto).
+
+    Somme e conteggi con np.bincount, massimi con np.fmax.at: kernel NumPy
+    senza il costo fisso di dispatch di un groupby pandas.
+    """
+    valid = ~np.isnan(values)
+    counts = np.bincount(group_ids[valid], minlength=n_groups)
+    sums = np.bincount(group_ids[valid], weights=values[valid], minlength=n_groups)
+    best = np.full(n_groups, np.nan)
+    np.fmax.at(best, group_ids, values)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(counts > 0, sums / counts, np.nan)
+    return means, best
+
+
+# Colonne percentuali delle statistiche per categoria (formato da column_config)
+CATEGORY_STATS_PERCENT_HEADERS = ("Media 1a", "Media 3a", "Migliore 1a", "Migliore 3a")
+
+
+def category_statistics(arrays: UniverseArrays) -> pd.DataFrame:
+    """
+    Statistiche per categoria Morningstar: numero fondi, media e migliore
+    performance a 1 e 3 anni, dalla categoria più numerosa.
+
+    I gruppi si ricavano dai codici del Categorical (category_groups, ""
+    confluisce in "Senza Categoria"); conteggi, medie e massimi sono
+    calcolati con kernel NumPy per gruppo. A parità di conteggio resta
+    l'ordine di prima comparsa. Le percentuali restano numeriche (x100,
+    NaN se nessun dato): il formato è applicato da column_config.
+    """
+    group_ids, labels = category_groups(arrays.category)
+    n_groups = len(labels)
+
+    counts = np.bincount(group_ids, minlength=n_groups)
+    avg_1y, best_1y = grouped_mean_max(group_ids, arrays.period("1y"), n_groups)
+    avg_3y, best_3y = grouped_mean_max(group_ids, arrays.period("3y"), n_groups)
+
+    # Gruppi già in ordine di prima comparsa: ordinamento stabile per conteggio
+    order = np.argsort(-counts, kind="stable")
+
+    return pd.DataFrame({
+        "Categoria": labels[order],
+        "N. Fondi": counts[order],
+        "Media 1a": avg_1y[order] * 100,
+        "Media 3a": avg_3y[order] * 100,
+        "Migliore 1a": best_1y[order] * 100,
+        "Migliore 3a": best_3y[order] * 100,
+    })
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def cached_category_statistics(
+    cache_key: tuple,
+    _arrays: UniverseArrays
+) -> pd.DataFrame:
+    """Statistiche per categoria, ricalcolate solo se cambia cache_key."""
+    return category_statistics(_arrays)
+
+
+def category_values(column: pd.Categorical) -> List[str]:
+    """Valori distinti non vuoti di una colonna categorica, in ordine alfabetico."""
+    return [cat for cat in column.remove_unused_categories().categories if cat]
+
+
+def unique_sorted(values: List[Optional[str]]) -> List[str]:
+    """Valori distinti non vuoti in ordine alfabetico (hashtable di pd.unique)."""
+    uniques = pd.unique(np.asarray(values, dtype=object))
+    uniques = uniques[pd.notna(uniques) & (uniques != "")]
+    uniques.sort()
+    return uniques.tolist()
+
+
+def get_unique_categories(
+    instruments: List[UniverseInstrument],
+    arrays: Optional[UniverseArrays] = None
+) -> List[str]:
     """Estrae lista di categorie uniche dagli strumenti."""
-    categories = set()
-    for inst in instruments:
-        if inst.category_morningstar:
-            categories.add(inst.category_morningstar)
-    return sorted(categories)
+    if arrays is not None:
+        # Il dizionario del Categorical è già deduplicato e ordinato:
+        # basta scartare i valori non usati, senza sorted()
+        return category_values(arrays.category)
+    return unique_sorted([inst.category_morningstar for inst in instruments])
 
 
-def get_unique_sfdr_categories(instruments: List[UniverseInstrument]) -> List[str]:
+def get_unique_sfdr_categories(
+    instruments: List[UniverseInstrument],
+    arrays: Optional[UniverseArrays] = None
+) -> List[str]:
     """Estrae lista di categorie SFDR uniche."""
-    categories = set()
-    for inst in instruments:
-        if inst.category_sfdr:
-            categories.add(inst.category_sfdr)
-    return sorted(categories)
+    if arrays is not None:
+        return category_values(arrays.sfdr)
+    return unique_sorted([inst.category_sfdr for inst in instruments])
+
+
+def category_match_mask(column: pd.Categorical, needles: List[str]) -> np.ndarray:
+    """
+    Maschera delle righe la cui categoria contiene almeno una sottostringa.
+
+    Il dizionario viene portato in minuscolo una sola volta per chiamata
+    (operazione vettoriale sull'Index, non .lower() per riga); il confronto
+    gira sui valori distinti e la maschera per riga si ottiene indicizzando
+    con i codici.
+    """
+    lowered = column.categories.str.lower()
+    hits = np.zeros(len(lowered), dtype=bool)
+    for needle in needles:
+        hits |= lowered.str.contains(needle, regex=False)
+    # "" (categoria assente) non corrisponde mai
+    hits &= lowered != ""
+    return hits[column.codes]
 
 
 def apply_filters(
     instruments: List[UniverseInstrument],
     selected_categories: List[str],
-    sfdr_filter: Optional[str]
-) -> List[UniverseInstrument]:
+    sfdr_filter: Optional[str],
+    arrays: Optional[UniverseArrays] = None
+) -> Tuple[List[UniverseInstrument], UniverseArrays]:
     """
     Applica filtri alla lista di strumenti.
 
+    I filtri producono una maschera booleana sugli array colonnari: il
+    confronto per sottostringa gira solo sul dizionario delle categorie,
+    poi i codici interi lo estendono a tutte le righe. Senza filtri attivi
+    si esce subito, senza toccare gli array.
+
     Args:
         instruments: Lista strumenti da filtrare
         selected_categories: Lista categorie Morningstar selezionate (OR logic)
         sfdr_filter: Filtro categoria SFDR (singola selezione)
+        arrays: Vista colonnare allineata a instruments (costruita se assente)
 
     Returns:
-        Lista strumenti filtrati
+        Tupla (strumenti filtrati, vista colonnare allineata)
     """
-    filtered = instruments
+    sfdr_active = bool(sfdr_filter) and sfdr_filter != "Tutte"
+    if arrays is None:
+        arrays = UniverseArrays.from_instruments(instruments)
+    if not selected_categories and not sfdr_active:
+        return instruments, arrays
+
+    mask = np.ones(len(arrays), dtype=bool)
 
     # Filtro categorie Morningstar (multiselect con logica OR)
     if selected_categories:
-        filtered = [
-            inst for inst in filtered
-            if inst.category_morningstar and any(
-                cat.lower() in inst.category_morningstar.lower()
-                for cat in selected_categories
-            )
-        ]
+        mask &= category_match_mask(
+            arrays.category, [cat.lower() for cat in selected_categories]
+        )
 
     # Filtro categoria SFDR
-    if sfdr_filter and sfdr_filter != "Tutte":
-        filtered = [
-            inst for inst in filtered
-            if inst.category_sfdr and sfdr_filter.lower() in inst.category_sfdr.lower()
-        ]
+    if sfdr_active:
+        mask &= category_match_mask(arrays.sfdr, [sfdr_filter.lower()])
 
-    return filtered
+    if mask.all():
+        return instruments, arrays
 
+    indices = np.flatnonzero(mask)
+    return [instruments[i] for i in indices], arrays.subset(indices)
 
-# ============================================================================
-# SIDEBAR - UPLOAD E FILTRI
-# ============================================================================
 
-with st.sidebar:
-    st.title("📊 Selettore v4.1")
-    st.divider()
+@st.fragment
+def universe_download_section(
+    cache_key: tuple,
+    arrays: UniverseArrays
+) -> None:
+    """
+    Pulsante di export dei fondi mostrati.
 
-    # =====================================
-    # SEZIONE UPLOAD UNIVERSO
-    # =====================================
-    st.subheader("📁 Carica Universo Fondi")
+    Come fragment, un click riesegue solo questa sezione e non l'intero
+    script; i bytes sono generati al click e riusati dalla cache.
+    """
+    col1, col2, col3 = st.columns([1, 2, 1])
 
-    uploaded_file = st.file_uploader(
-        "File Excel con dati completi",
-        type=["xlsx", "xls"],
-        help="File Excel con colonne: Nome, ISIN, Performance, Categoria Morningstar, etc."
-    )
+    with col2:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M")
+        filename = f"fondi_selezionati_{timestamp}.xlsx"
+
+        st.download_button(
+            label="📥 SCARICA EXCEL",
+            data=lambda: cached_universe_excel(cache_key, arrays),
+            file_name=filename,
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            type="primary",
+            key="download_excel"
+        )
 
-    if uploaded_file is not None:
-        # Carica solo se nuovo file o non ancora caricato
-        if st.session_state.universe_filename != uploaded_file.name or not st.session_state.universe_loaded:
-            result = load_universe(uploaded_file)
-
-            if result:
-                if result.valid_count > 0:
-                    st.success(f"✅ {result.valid_count} fondi caricati")
-                    if result.warnings:
-                        with st.expander(f"⚠️ {len(result.warnings)} avvisi"):
-                            for w in result.warnings[:10]:
-                                st.warning(w)
-                            if len(result.warnings) > 10:
-                                st.info(f"...e altri {len(result.warnings) - 10} avvisi")
-                else:
-                    for err in result.errors:
-                        st.error(err)
-        else:
-            # File gia' caricato
-            st.success(f"✅ {st.session_state.universe_load_result.valid_count} fondi caricati")
+        st.caption(f"File: {filename}")
 
-    st.divider()
 
-    # =====================================
-    # SEZIONE PRE-CARICAMENTO ETF BENCHMARK
-    # =====================================
-    st.subheader("📦 Prepara ETF Benchmark")
+@st.fragment
+def comparison_download_section(cache_key: tuple, report, etf_isin: str) -> None:
+    """Pulsante di export del confronto (fragment, bytes generati al click)."""
+    col1, col2, col3 = st.columns([1, 2, 1])
 
+    with col2:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M")
+        filename_comparison = f"confronto_etf_{etf_isin}_{timestamp}.xlsx"
+
+        st.download_button(
+            label="📥 SCARICA RISULTATI CONFRONTO",
+            data=lambda: cached_comparison_excel(cache_key, report),
+            file_name=filename_comparison,
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            type="primary",
+            key="download_comparison"
+        )
+
+
+@st.fragment
+def etf_preload_section() -> None:
+    """
+    Stato della cache ETF e pre-caricamento degli ISIN benchmark.
+
+    Come fragment, scrivere gli ISIN o premere PREPARA ETF riesegue solo
+    questa sezione della sidebar, non filtri, tabelle e confronto.
+    """
     cache_status = get_etf_cache_status()
 
     if cache_status['count'] > 0:
@@ -420,10 +807,13 @@ with st.sidebar:
         if not etf_isins_input.strip():
             st.warning("⚠️ Inserisci almeno un ISIN")
         else:
-            # Parsa gli ISIN (supporta virgola, spazio, newline)
-            import re
-            isins = re.split(r'[,\s\n]+', etf_isins_input.strip())
-            isins = [isin.strip().upper() for isin in isins if isin.strip()]
+            # Parsa gli ISIN (supporta virgola, spazio, newline); i duplicati
+            # sono rimossi prima del limite, mantenendo l'ordine di inserimento
+            isins = list(dict.fromkeys(
+                isin.upper()
+                for isin in ISIN_SPLIT_RE.split(etf_isins_input.strip())
+                if isin
+            ))
 
             if len(isins) > 15:
                 st.warning("⚠️ Massimo 15 ISIN alla volta. Uso i primi 15.")
@@ -444,8 +834,71 @@ with st.sidebar:
                 for item in result['failed']:
                     st.text(f"  ✗ {item['isin']}: {item['reason']}")
 
+            # Aggiorna lo stato della cache mostrato sopra: basta rieseguire
+            # il fragment, il confronto legge la cache al momento del click
             if result['loaded']:
-                st.rerun()
+                st.rerun(scope="fragment")
+
+
+# ============================================================================
+# SIDEBAR - UPLOAD E FILTRI
+# ============================================================================
+
+with st.sidebar:
+    st.title("📊 Selettore v4.1")
+    st.divider()
+
+    # =====================================
+    # SEZIONE UPLOAD UNIVERSO
+    # =====================================
+    st.subheader("📁 Carica Universo Fondi")
+
+    uploaded_file = st.file_uploader(
+        "File Excel con dati completi",
+        type=["xlsx", "xls"],
+        help="File Excel con colonne: Nome, ISIN, Performance, Categoria Morningstar, etc."
+    )
+
+    if uploaded_file is not None:
+        # Carica solo per un nuovo upload: file_id cambia a ogni caricamento
+        # (anche con lo stesso nome), mentre i rerun successivi lo riusano
+        just_loaded = False
+        if st.session_state.universe_file_id != uploaded_file.file_id:
+            # Nuovo upload: ricarica solo se il contenuto è cambiato
+            file_sig = uploaded_file_signature(uploaded_file)
+            if file_sig != st.session_state.universe_file_sig:
+                load_universe(uploaded_file, file_sig)
+                just_loaded = True
+            st.session_state.update({
+                'universe_file_id': uploaded_file.file_id,
+                # Impronta solo di un caricamento riuscito: dopo un errore
+                # lo stesso file, ricaricato, viene elaborato di nuovo
+                'universe_file_sig': (
+                    file_sig if st.session_state.universe_loaded else None
+                ),
+            })
+
+        result = st.session_state.universe_load_result
+        if result:
+            if result.valid_count > 0:
+                st.success(f"✅ {result.valid_count} fondi caricati")
+                if just_loaded and result.warnings:
+                    with st.expander(f"⚠️ {len(result.warnings)} avvisi"):
+                        for w in result.warnings[:10]:
+                            st.warning(w)
+                        if len(result.warnings) > 10:
+                            st.info(f"...e altri {len(result.warnings) - 10} avvisi")
+            else:
+                for err in result.errors:
+                    st.error(err)
+
+    st.divider()
+
+    # =====================================
+    # SEZIONE PRE-CARICAMENTO ETF BENCHMARK
+    # =====================================
+    st.subheader("📦 Prepara ETF Benchmark")
+    etf_preload_section()
 
     st.divider()
 
@@ -454,84 +907,103 @@ with st.sidebar:
     # =====================================
     selected_categories = []
     sfdr_filter = None
-    sort_by = "3y"
+    sort_by = DEFAULT_SORT_PERIOD
     sort_ascending = False
     top_n = None
 
     if st.session_state.universe_loaded:
-        st.subheader("🔧 Filtri")
-
-        # Categorie disponibili
-        available_categories = get_unique_categories(st.session_state.universe_instruments)
-        available_sfdr = get_unique_sfdr_categories(st.session_state.universe_instruments)
-
-        # Filtro categorie Morningstar (MULTISELECT)
-        if available_categories:
-            selected_categories = st.multiselect(
-                "Categorie Morningstar",
-                options=available_categories,
-                default=[],
-                help="Seleziona una o piu' categorie (lascia vuoto per mostrare tutte)"
-            )
+        # I widget in un form: le modifiche non rieseguono lo script fino al submit
+        with st.form("filters", border=False):
+            st.subheader("🔧 Filtri")
+
+            # Categorie disponibili
+            # Opzioni calcolate al caricamento, non a ogni rerun
+            available_categories = st.session_state.available_categories
+            available_sfdr = st.session_state.available_sfdr
+
+            # Filtro categorie Morningstar (MULTISELECT)
+            if available_categories:
+                selected_categories = st.multiselect(
+                    "Categorie Morningstar",
+                    options=available_categories,
+                    default=[],
+                    help="Seleziona una o piu' categorie (lascia vuoto per mostrare tutte)"
+                )
 
-        # Filtro SFDR
-        if available_sfdr:
-            sfdr_filter = st.selectbox(
-                "Categoria SFDR",
-                options=["Tutte"] + available_sfdr,
-                index=0,
-                help="Filtra per categoria SFDR (Art. 6, 8, 9)"
-            )
+            # Filtro SFDR
+            if available_sfdr:
+                sfdr_filter = st.selectbox(
+                    "Categoria SFDR",
+                    options=["Tutte"] + available_sfdr,
+                    index=0,
+                    help="Filtra per categoria SFDR (Art. 6, 8, 9)"
+                )
 
-        st.divider()
+            st.divider()
 
-        # Ordinamento
-        st.subheader("📊 Ordinamento")
+            # Ordinamento
+            st.subheader("📊 Ordinamento")
 
-        sort_by_label = st.selectbox(
-            "Ordina per periodo",
-            options=list(PERFORMANCE_PERIODS.keys()),
-            index=4,  # default: 1 anno
-            help="Periodo per ordinamento risultati"
-        )
-        sort_by = PERFORMANCE_PERIODS[sort_by_label]
+            sort_by_label = st.selectbox(
+                "Ordina per periodo",
+                options=PERFORMANCE_PERIOD_LABELS,
+                index=DEFAULT_SORT_INDEX,
+                help="Periodo per ordinamento risultati"
+            )
+            sort_by = PERFORMANCE_PERIODS[sort_by_label]
 
-        sort_ascending = st.checkbox(
-            "Ordine crescente",
-            value=False,
-            help="Se attivo, mostra prima i peggiori"
-        )
+            sort_ascending = st.checkbox(
+                "Ordine crescente",
+                value=False,
+                help="Se attivo, mostra prima i peggiori"
+            )
 
-        top_n = st.number_input(
-            "Mostra primi N",
-            min_value=0,
-            max_value=500,
-            value=0,
-            step=10,
-            help="0 = mostra tutti"
-        )
-        if top_n == 0:
-            top_n = None
+            top_n = st.number_input(
+                "Mostra primi N",
+                min_value=0,
+                max_value=500,
+                value=0,
+                step=10,
+                help="0 = mostra tutti"
+            )
+            if top_n == 0:
+                top_n = None
 
-        st.divider()
+            st.divider()
 
-        # Pulsante applica filtri
-        if st.button("🔎 APPLICA FILTRI", type="primary", use_container_width=True):
+            # Pulsante applica filtri
+            apply_clicked = st.form_submit_button(
+                "🔎 APPLICA FILTRI",
+                type="primary",
+                use_container_width=True
+            )
+
+        if apply_clicked:
             # Applica filtri
-            filtered = apply_filters(
+            filtered, filtered_arrays = apply_filters(
                 st.session_state.universe_instruments,
                 selected_categories,
-                sfdr_filter if sfdr_filter != "Tutte" else None
+                sfdr_filter if sfdr_filter != "Tutte" else None,
+                st.session_state.universe_arrays
             )
 
-            # Ordina
-            filtered = rank_by_performance(filtered, sort_by, ascending=sort_ascending, top_n=top_n)
+            # Ordina: gli stessi indici riallineano lista e vista colonnare
+            ranked = rank_indices_by_performance(
+                filtered_arrays,
+                sort_by,
+                ascending=sort_ascending,
+                top_n=top_n
+            )
 
-            st.session_state.filtered_instruments = filtered
-            st.session_state.filter_applied = True
             # Reset confronto quando cambiano i filtri
-            st.session_state.comparison_report = None
-            st.session_state.comparison_done = False
+            st.session_state.update({
+                'filtered_instruments': [filtered[i] for i in ranked],
+                'filtered_arrays': filtered_arrays.subset(ranked),
+                'filter_applied': True,
+                'comparison_report': None,
+                'comparison_df': None,
+                'comparison_done': False,
+            })
 
     # Info
     with st.expander("ℹ️ Informazioni"):
@@ -575,6 +1047,7 @@ else:
     # Statistiche universe
     total_instruments = len(st.session_state.universe_instruments)
     displayed_instruments = st.session_state.filtered_instruments
+    displayed_arrays = st.session_state.filtered_arrays
     displayed_count = len(displayed_instruments)
 
     if st.session_state.filter_applied:
@@ -586,8 +1059,16 @@ else:
             f"📊 **{total_instruments}** fondi caricati. Applica filtri per raffinare la ricerca."
         )
         displayed_instruments = st.session_state.universe_instruments
+        displayed_arrays = st.session_state.universe_arrays
+
+    # Chiave dei fondi visualizzati, condivisa da tabella, export e statistiche
+    displayed_key = displayed_cache_key(displayed_arrays)
 
     # Metriche Summary
+    # Media e migliore sul periodo di ordinamento (sort_by ha sempre un valore:
+    # DEFAULT_SORT_PERIOD finché il form non è mostrato), una sola volta
+    avg_perf, best_perf = performance_summary(displayed_arrays, sort_by)
+
     col1, col2, col3, col4 = st.columns(4)
 
     with col1:
@@ -597,38 +1078,30 @@ else:
         )
 
     with col2:
-        # Calcola media performance sul periodo selezionato
-        perfs = [
-            inst.get_performance_by_period(sort_by if 'sort_by' in dir() else "1y")
-            for inst in displayed_instruments
-        ]
-        valid_perfs = [p for p in perfs if p is not None]
-        if valid_perfs:
-            avg_perf = sum(valid_perfs) / len(valid_perfs) * 100
+        if avg_perf is not None:
             st.metric(
                 label="Media Performance",
-                value=f"{avg_perf:.1f}%"
+                value=f"{avg_perf * 100:.1f}%"
             )
         else:
             st.metric(label="Media Performance", value="N/A")
 
     with col3:
-        # Migliore performance
-        if valid_perfs:
-            best_perf = max(valid_perfs) * 100
+        if best_perf is not None:
             st.metric(
                 label="Migliore",
-                value=f"{best_perf:.1f}%"
+                value=f"{best_perf * 100:.1f}%"
             )
         else:
             st.metric(label="Migliore", value="N/A")
 
     with col4:
-        # Numero categorie
-        cats = get_unique_categories(displayed_instruments)
+        # Numero categorie: stesse regole del filtro in sidebar, contate sui
+        # codici del Categorical (nessun hashing di stringhe per rerun)
+        n_categories = len(category_values(displayed_arrays.category))
         st.metric(
             label="Categorie",
-            value=len(cats)
+            value=int(n_categories)
         )
 
     # =========================================================================
@@ -654,8 +1127,8 @@ else:
     with col2:
         comparison_period_label = st.selectbox(
             "Periodo Confronto",
-            options=list(PERFORMANCE_PERIODS.keys()),
-            index=5,  # default: 3 anni
+            options=PERFORMANCE_PERIOD_LABELS,
+            index=DEFAULT_COMPARISON_INDEX,
             key="comparison_period",
             help="Periodo per il calcolo del delta"
         )
@@ -674,16 +1147,16 @@ else:
         if not etf_isin_input:
             st.warning("⚠️ Inserisci l'ISIN dell'ETF benchmark")
         else:
-            # Verifica se l'ETF è nell'universo
-            etf_in_universe = any(
-                inst.isin.upper() == etf_isin_input.strip().upper()
-                for inst in st.session_state.universe_instruments
+            # Verifica se l'ETF è nell'universo (indice costruito al caricamento)
+            target_isin = etf_isin_input.strip().upper()
+            etf_in_universe = target_isin in st.session_state.universe_index
+
+            # Se non è nell'universo, verifica se è già nella cache ETF (24 ore):
+            # lookup diretto, senza ricostruire lo stato dell'intera cache
+            etf_in_cache = (
+                not etf_in_universe and find_etf_in_cache(target_isin) is not None
             )
 
-            # Se non è nell'universo, verifica se è in cache
-            cache_status = get_etf_cache_status()
-            etf_in_cache = etf_isin_input.strip().upper() in cache_status['isins']
-
             if not etf_in_universe and not etf_in_cache:
                 st.info(
                     "ℹ️ ETF non in universo/cache. "
@@ -701,21 +1174,33 @@ else:
                 # Cerca nell'universo completo (non solo i filtrati)
                 etf = get_etf_benchmark(
                     etf_isin_input,
-                    st.session_state.universe_instruments
+                    st.session_state.universe_index
                 )
 
             if etf is None:
                 st.error(f"❌ ETF con ISIN '{etf_isin_input}' non trovato")
             else:
                 # Esegui confronto sui fondi filtrati
-                report = compare_universe_vs_etf(
+                comparison_key = (
+                    displayed_cache_key(displayed_arrays),
+                    etf.isin,
+                    etf.get_performance_by_period(comparison_period),
+                    comparison_period,
+                )
+                report, df_comparison = cached_comparison(
+                    comparison_key,
                     displayed_instruments,
                     etf,
                     comparison_period,
-                    comparison_period_label
+                    comparison_period_label,
+                    displayed_arrays
                 )
-                st.session_state.comparison_report = report
-                st.session_state.comparison_done = True
+                st.session_state.update({
+                    'comparison_report': report,
+                    'comparison_df': df_comparison,
+                    'comparison_key': comparison_key,
+                    'comparison_done': True,
+                })
 
     # Mostra risultati confronto se disponibili
     if st.session_state.comparison_done and st.session_state.comparison_report:
@@ -770,57 +1255,25 @@ else:
 
         st.divider()
 
-        # Tabella risultati
-        comparison_data = []
-
-        # Prima riga: ETF benchmark
-        comparison_data.append({
-            "Nome": f"🎯 {etf.name or etf.isin}",
-            "ISIN": etf.isin,
-            "Categoria": etf.category_morningstar or "-",
-            f"Perf. {report.period_label}": f"{etf_perf * 100:.2f}%" if etf_perf else "N/A",
-            "Delta vs ETF": "BENCHMARK",
-            "Status": "🎯 BENCHMARK"
-        })
-
-        # Risultati ordinati
-        for r in report.get_sorted_results():
-            row = {
-                "Nome": r.instrument.name or r.instrument.isin,
-                "ISIN": r.instrument.isin,
-                "Categoria": r.instrument.category_morningstar or "",
-                f"Perf. {report.period_label}": f"{r.fund_performance * 100:.2f}%" if r.fund_performance else "N/A",
-                "Delta vs ETF": f"{r.delta * 100:+.2f}%" if r.delta else "N/A",
-                "Status": r.status_emoji
-            }
-            comparison_data.append(row)
-
-        df_comparison = pd.DataFrame(comparison_data)
+        # Tabella risultati (costruita insieme al report)
+        df_comparison = st.session_state.comparison_df
 
         # Mostra tabella con styling
         st.dataframe(
             df_comparison,
             hide_index=True,
+            column_config={
+                f"Perf. {report.period_label}": st.column_config.NumberColumn(format="%.2f%%"),
+                "Delta vs ETF": st.column_config.NumberColumn(format="%+.2f%%"),
+            },
             use_container_width=True,
             height=500
         )
 
         # Download risultati confronto
-        col1, col2, col3 = st.columns([1, 2, 1])
-        with col2:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M")
-            filename_comparison = f"confronto_etf_{etf.isin}_{timestamp}.xlsx"
-
-            excel_data_comparison = comparison_to_excel(report)
-
-            st.download_button(
-                label="📥 SCARICA RISULTATI CONFRONTO",
-                data=excel_data_comparison,
-                file_name=filename_comparison,
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                type="primary",
-                key="download_comparison"
-            )
+        comparison_download_section(
+            st.session_state.comparison_key, report, etf.isin
+        )
 
     # =========================================================================
     # TABELLA FONDI (se non in modalita' confronto)
@@ -829,11 +1282,18 @@ else:
         st.divider()
         st.subheader("📋 Fondi")
 
-        df = universe_to_dataframe(displayed_instruments)
-
-        if not df.empty:
+        # DataFrame dei fondi (in cache) costruito solo in questa vista: in
+        # modalità confronto la tabella non è mostrata e non serve
+        if displayed_instruments:
             st.dataframe(
-                df,
+                session_memo(
+                    '_displayed_df_memo', displayed_key,
+                    lambda: cached_universe_dataframe(displayed_key, displayed_arrays)
+                ),
+                column_config={
+                    header: st.column_config.NumberColumn(format="%.2f%%")
+                    for header in UNIVERSE_PERCENT_HEADERS
+                },
                 hide_index=True,
                 height=500,
                 use_container_width=True
@@ -845,58 +1305,25 @@ else:
 
         # Download
         if displayed_instruments:
-            col1, col2, col3 = st.columns([1, 2, 1])
-
-            with col2:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M")
-                filename = f"fondi_selezionati_{timestamp}.xlsx"
-
-                excel_data = universe_to_excel(displayed_instruments)
-
-                st.download_button(
-                    label="📥 SCARICA EXCEL",
-                    data=excel_data,
-                    file_name=filename,
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    type="primary",
-                    key="download_excel"
-                )
-
-                st.caption(f"File: {filename}")
+            universe_download_section(displayed_key, displayed_arrays)
 
     # Statistiche per categoria
     if displayed_instruments and not st.session_state.comparison_done:
         st.divider()
         st.subheader("📊 Statistiche per Categoria")
 
-        groups = group_by_category(displayed_instruments)
-
-        # Calcola statistiche per ogni categoria
-        stats_data = []
-        for cat_name, cat_instruments in groups.items():
-            perfs_1y = [
-                inst.perf_1y for inst in cat_instruments
-                if inst.perf_1y is not None
-            ]
-            perfs_3y = [
-                inst.perf_3y for inst in cat_instruments
-                if inst.perf_3y is not None
-            ]
-
-            stats_data.append({
-                "Categoria": cat_name,
-                "N. Fondi": len(cat_instruments),
-                "Media 1a": f"{sum(perfs_1y) / len(perfs_1y) * 100:.1f}%" if perfs_1y else "N/A",
-                "Media 3a": f"{sum(perfs_3y) / len(perfs_3y) * 100:.1f}%" if perfs_3y else "N/A",
-                "Migliore 1a": f"{max(perfs_1y) * 100:.1f}%" if perfs_1y else "N/A",
-                "Migliore 3a": f"{max(perfs_3y) * 100:.1f}%" if perfs_3y else "N/A",
-            })
-
-        stats_df = pd.DataFrame(stats_data)
-        stats_df = stats_df.sort_values("N. Fondi", ascending=False)
+        # Stessa chiave della tabella fondi: cambia solo con upload o filtri
+        stats_df = session_memo(
+            '_stats_df_memo', displayed_key,
+            lambda: cached_category_statistics(displayed_key, displayed_arrays)
+        )
 
         st.dataframe(
             stats_df,
+            column_config={
+                header: st.column_config.NumberColumn(format="%.1f%%")
+                for header in CATEGORY_STATS_PERCENT_HEADERS
+            },
             hide_index=True,
             use_container_width=True
         )
@@ -2,14 +2,14 @@
 Configurazione globale per Selettore Rendimenti Fondi/ETF.
 """
 from dataclasses import dataclass, field
-from typing import Dict, List
+from typing import Dict, FrozenSet, List, Tuple
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
-@dataclass
+@dataclass(slots=True)
 class ScraperConfig:
     """Configurazione per singolo scraper."""
     enabled: bool = True
@@ -18,6 +18,25 @@ class ScraperConfig:
     max_retries: int = 3
 
 
+# Parametri degli scraper letti dall'ambiente una sola volta, all'import:
+# ogni AppConfig riusa i valori già convertiti invece di rileggere os.environ
+_SCRAPER_ENV: Dict[str, Tuple[float, int]] = {
+    "justetf": (
+        float(os.getenv("JUSTETF_RATE_LIMIT", "2.0")),
+        int(os.getenv("JUSTETF_TIMEOUT", "90")),
+    ),
+    "morningstar": (
+        # Increased from 0.5 to 2.0 to avoid rate limiting
+        float(os.getenv("MORNINGSTAR_RATE_LIMIT", "2.0")),
+        int(os.getenv("MORNINGSTAR_TIMEOUT", "60")),
+    ),
+    "investiny": (
+        float(os.getenv("INVESTINY_RATE_LIMIT", "2.0")),
+        int(os.getenv("INVESTINY_TIMEOUT", "60")),
+    ),
+}
+
+
 @dataclass
 class AppConfig:
     """Configurazione globale applicazione."""
@@ -43,22 +62,8 @@ class AppConfig:
     def __post_init__(self):
         if not self.scrapers:
             self.scrapers = {
-                "justetf": ScraperConfig(
-                    enabled=True,
-                    rate_limit=float(os.getenv("JUSTETF_RATE_LIMIT", "2.0")),
-                    timeout=int(os.getenv("JUSTETF_TIMEOUT", "90")),
-                ),
-                "morningstar": ScraperConfig(
-                    enabled=True,
-                    # Increased from 0.5 to 2.0 to avoid rate limiting
-                    rate_limit=float(os.getenv("MORNINGSTAR_RATE_LIMIT", "2.0")),
-                    timeout=int(os.getenv("MORNINGSTAR_TIMEOUT", "60")),
-                ),
-                "investiny": ScraperConfig(
-                    enabled=True,
-                    rate_limit=float(os.getenv("INVESTINY_RATE_LIMIT", "2.0")),
-                    timeout=int(os.getenv("INVESTINY_TIMEOUT", "60")),
-                ),
+                name: ScraperConfig(enabled=True, rate_limit=rate_limit, timeout=timeout)
+                for name, (rate_limit, timeout) in _SCRAPER_ENV.items()
             }
 
 
@@ -142,6 +147,10 @@ ASSOGESTIONI_CATEGORIES: List[str] = [
     "FONDI DI LIQUIDITA' ALTRE VALUTE",
 ]
 
+# Insiemi per i test di appartenenza (le liste sopra restano per l'ordine)
+MORNINGSTAR_CATEGORIES_SET: FrozenSet[str] = frozenset(MORNINGSTAR_CATEGORIES)
+ASSOGESTIONI_CATEGORIES_SET: FrozenSet[str] = frozenset(ASSOGESTIONI_CATEGORIES)
+
 # Valute supportate
 CURRENCIES: List[str] = ["EUR", "USD", "GBP", "CHF"]
 
@@ -159,6 +168,20 @@ PERFORMANCE_PERIODS: Dict[str, str] = {
     "10 anni": "10y",
 }
 
+# Etichette e codici periodo precalcolati (opzioni selectbox, colonne matrici)
+PERFORMANCE_PERIOD_LABELS: Tuple[str, ...] = tuple(PERFORMANCE_PERIODS.keys())
+PERFORMANCE_PERIOD_CODES: Tuple[str, ...] = tuple(PERFORMANCE_PERIODS.values())
+
+# Periodo di ordinamento predefinito (selectbox e metriche prima del submit)
+DEFAULT_SORT_PERIOD: str = "1y"
+
+# Periodo predefinito del confronto con l'ETF
+DEFAULT_COMPARISON_PERIOD: str = "3y"
+
+# Indici dei default nelle opzioni dei selectbox, risolti una volta sola
+DEFAULT_SORT_INDEX: int = PERFORMANCE_PERIOD_CODES.index(DEFAULT_SORT_PERIOD)
+DEFAULT_COMPARISON_INDEX: int = PERFORMANCE_PERIOD_CODES.index(DEFAULT_COMPARISON_PERIOD)
+
 # Configurazione Universe Loader (v3.1)
 # Increased to support larger files like giada1.xlsx with 3400+ instruments
 # NOTE: Previous limit was 500, now 5000 to support full universe files
@@ -193,5 +216,16 @@ CATEGORY_MAPPING: Dict[str, List[str]] = {
     "FONDI DI LIQUIDITA' AREA EURO": ["Monetari EUR"],
 }
 
+# Mapping inverso Morningstar -> Assogestioni, nell'ordine di CATEGORY_MAPPING
+MORNINGSTAR_TO_ASSOGESTIONI: Dict[str, Tuple[str, ...]] = {
+    ms_cat: tuple(
+        asso_cat for asso_cat, ms_cats in CATEGORY_MAPPING.items()
+        if ms_cat in ms_cats
+    )
+    for ms_cat in dict.fromkeys(
+        ms_cat for ms_cats in CATEGORY_MAPPING.values() for ms_cat in ms_cats
+    )
+}
+
 # Istanza configurazione globale
 config = AppConfig()
@@ -5,15 +5,18 @@ Questo modulo implementa la logica di confronto tra i fondi dell'universo
 utente e un ETF benchmark, calcolando il delta di performance e
 classificando i fondi in base a chi batte o meno l'ETF.
 """
-from typing import List, Optional
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
 from dataclasses import dataclass, field
-from core.models import UniverseInstrument
+from core.models import UniverseInstrument, universe_period_getter
+from core.universe_loader import UniverseArrays
 import logging
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(slots=True)
 class ComparisonResult:
     """Risultato confronto singolo fondo vs ETF."""
     instrument: UniverseInstrument
@@ -43,33 +46,124 @@ class ComparisonResult:
             return "⚪ N/A"
 
 
-@dataclass
+class _ComparisonStats(NamedTuple):
+    """Aggregati di un ComparisonReport, calcolati insieme sui delta."""
+    beating: int
+    not_beating: int
+    no_data: int
+    avg_delta: Optional[float]
+    avg_delta_beating: Optional[float]
+    best_index: Optional[int]
+    worst_index: Optional[int]
+
+
+@dataclass(slots=True)
 class ComparisonReport:
     """Report completo confronto universo vs ETF."""
     etf_benchmark: UniverseInstrument
     period: str
     period_label: str
-    results: List[ComparisonResult] = field(default_factory=list)
+    # Congelati in tupla alla costruzione: si cambiano solo riassegnando
+    # results, e la nuova sequenza viene a sua volta congelata al primo uso
+    results: Sequence[ComparisonResult] = ()
+    # Valori derivati da results (delta, ordinamenti, aggregati), validi
+    # finché results è la tupla _cache_source
+    _cache: Dict[Any, Any] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+    _cache_source: Optional[Tuple[ComparisonResult, ...]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    def __post_init__(self) -> None:
+        self._invalidate()
+
+    def _invalidate(self) -> None:
+        """
+        Congela results in tupla e svuota i valori derivati.
+
+        Da chiamare dopo aver modificato in place un ComparisonResult del
+        report; riassegnare results non lo richiede.
+        """
+        # tuple() su una tupla restituisce lo stesso oggetto, senza copia
+        self.results = tuple(self.results)
+        self._cache.clear()
+        self._cache_source = self.results
+
+    def _cached(self, key: Any, compute: Callable[[], Any]) -> Any:
+        """
+        Valore derivato da results, calcolato al primo uso e riusato.
+
+        La validità si verifica con un solo confronto di identità: una
+        tupla non cambia in place, quindi results è cambiato solo se è
+        stato riassegnato.
+        """
+        if self.results is not self._cache_source:
+            self._invalidate()
+        cache = self._cache
+        if key not in cache:
+            cache[key] = compute()
+        return cache[key]
+
+    def _deltas(self) -> np.ndarray:
+        """
+        Delta dei risultati come array float64 (NaN se assente), allineato
+        a results; fornito da compare_universe_vs_etf o ricavato al primo uso.
+        """
+        # None -> NaN nella conversione a float64
+        return self._cached("deltas", lambda: np.array(
+            [r.delta for r in self.results], dtype=np.float64
+        ))
 
     @property
     def total_funds(self) -> int:
         """Numero totale di fondi confrontati."""
         return len(self.results)
 
+    def _stats(self) -> "_ComparisonStats":
+        """
+        Aggregati dei delta calcolati in blocco e riusati: la UI legge più
+        proprietà per rerun, ma l'array viene analizzato una volta sola
+        finché results non cambia.
+        """
+        return self._cached("stats", self._compute_stats)
+
+    def _compute_stats(self) -> "_ComparisonStats":
+        """Conteggi, medie e indici migliore/peggiore sull'array dei delta."""
+        deltas = self._deltas()
+        has_delta = ~np.isnan(deltas)
+        beating = deltas > 0
+        valid = deltas[has_delta]
+        beating_deltas = deltas[beating]
+        n_beating = int(np.count_nonzero(beating))
+        n_with_data = int(valid.size)
+        stats = _ComparisonStats(
+            beating=n_beating,
+            not_beating=n_with_data - n_beating,
+            no_data=len(deltas) - n_with_data,
+            avg_delta=float(valid.mean()) if valid.size else None,
+            avg_delta_beating=(
+                float(beating_deltas.mean()) if beating_deltas.size else None
+            ),
+            best_index=int(np.nanargmax(deltas)) if valid.size else None,
+            worst_index=int(np.nanargmin(deltas)) if valid.size else None,
+        )
+        return stats
+
     @property
     def funds_beating_etf(self) -> int:
-        """Numero di fondi che battono l'ETF."""
-        return sum(1 for r in self.results if r.beats_etf is True)
+        """Numero di fondi che battono l'ETF (delta > 0)."""
+        return self._stats().beating
 
     @property
     def funds_not_beating_etf(self) -> int:
-        """Numero di fondi che non battono l'ETF."""
-        return sum(1 for r in self.results if r.beats_etf is False)
+        """Numero di fondi che non battono l'ETF (delta <= 0)."""
+        return self._stats().not_beating
 
     @property
     def funds_no_data(self) -> int:
         """Numero di fondi senza dati per il confronto."""
-        return sum(1 for r in self.results if r.beats_etf is None)
+        return self._stats().no_data
 
     @property
     def etf_performance(self) -> Optional[float]:
@@ -79,34 +173,24 @@ class ComparisonReport:
     @property
     def avg_delta(self) -> Optional[float]:
         """Media dei delta (solo per fondi con dati)."""
-        deltas = [r.delta for r in self.results if r.delta is not None]
-        if deltas:
-            return sum(deltas) / len(deltas)
-        return None
+        return self._stats().avg_delta
 
     @property
     def avg_delta_beating(self) -> Optional[float]:
         """Media dei delta solo per fondi che battono l'ETF."""
-        deltas = [r.delta for r in self.results if r.beats_etf is True and r.delta is not None]
-        if deltas:
-            return sum(deltas) / len(deltas)
-        return None
+        return self._stats().avg_delta_beating
 
     @property
     def best_performer(self) -> Optional[ComparisonResult]:
-        """Fondo con il miglior delta."""
-        valid = [r for r in self.results if r.delta is not None]
-        if valid:
-            return max(valid, key=lambda r: r.delta if r.delta is not None else float('-inf'))
-        return None
+        """Fondo con il miglior delta (il primo, a parità)."""
+        index = self._stats().best_index
+        return self.results[index] if index is not None else None
 
     @property
     def worst_performer(self) -> Optional[ComparisonResult]:
-        """Fondo con il peggior delta."""
-        valid = [r for r in self.results if r.delta is not None]
-        if valid:
-            return min(valid, key=lambda r: r.delta if r.delta is not None else float('inf'))
-        return None
+        """Fondo con il peggior delta (il primo, a parità)."""
+        index = self._stats().worst_index
+        return self.results[index] if index is not None else None
 
     @property
     def beat_percentage(self) -> float:
@@ -120,81 +204,124 @@ class ComparisonReport:
         """
         Restituisce risultati ordinati per delta (default: migliori prima).
 
+        L'ordinamento è calcolato una sola volta per verso e riusato dalle
+        chiamate successive (tabella, export); si ricalcola se results
+        cambia in qualunque modo.
+
         Args:
             ascending: Se True, ordina dal peggiore al migliore
 
         Returns:
-            Lista di risultati ordinata
+            Lista di risultati ordinata (copia, modificabile dal chiamante)
         """
-        # Separa risultati con e senza delta
-        with_delta = [r for r in self.results if r.delta is not None]
-        without_delta = [r for r in self.results if r.delta is None]
-
-        # Ordina quelli con delta
-        sorted_with_delta = sorted(
-            with_delta,
-            key=lambda r: r.delta if r.delta is not None else 0.0,
-            reverse=not ascending
-        )
+        return list(self._cached(
+            ("sorted", ascending), lambda: self._sort_results(ascending)
+        ))
+
+    def _sort_results(self, ascending: bool) -> List[ComparisonResult]:
+        """Ordina i risultati per delta, quelli senza delta in coda."""
+        # Ordinamento stabile sull'array dei delta già calcolato, come
+        # sorted() sugli oggetti: a parità di delta resta l'ordine originale
+        deltas = self._deltas()
+        has_delta = ~np.isnan(deltas)
+        with_delta = np.flatnonzero(has_delta)
+        keys = deltas[with_delta]
+        order = with_delta[np.argsort(keys if ascending else -keys, kind="stable")]
 
         # Risultati senza delta alla fine
-        return sorted_with_delta + without_delta
+        results = self.results
+        return [results[i] for i in order] + [
+            results[i] for i in np.flatnonzero(~has_delta)
+        ]
 
 
 def compare_universe_vs_etf(
     universe: List[UniverseInstrument],
     etf_benchmark: UniverseInstrument,
     period: str,
-    period_label: str
+    period_label: str,
+    arrays: Optional[UniverseArrays] = None
 ) -> ComparisonReport:
     """
     Confronta tutti i fondi dell'universo con l'ETF benchmark.
 
+    Delta e classificazione sono calcolati sugli array del periodo (una
+    sottrazione e un confronto vettoriali); gli oggetti ComparisonResult
+    sono poi costruiti in un'unica passata, senza rami per riga.
+
     Args:
         universe: Lista fondi da confrontare
         etf_benchmark: ETF di riferimento
         period: Codice periodo (1m, 3m, 6m, ytd, 1y, 3y, 5y, 7y, 9y, 10y)
         period_label: Label periodo per display (es. "3 anni")
+        arrays: Vista colonnare allineata a universe (opzionale); se assente
+            la colonna del periodo è letta dagli oggetti
 
     Returns:
         ComparisonReport con tutti i risultati
     """
-    report = ComparisonReport(
-        etf_benchmark=etf_benchmark,
-        period=period,
-        period_label=period_label
-    )
-
     etf_perf = etf_benchmark.get_performance_by_period(period)
 
-    for fund in universe:
-        # Escludi l'ETF stesso dal confronto
-        if fund.isin == etf_benchmark.isin:
-            continue
-
-        fund_perf = fund.get_performance_by_period(period)
-
-        # Calcola delta e status
-        if etf_perf is not None and fund_perf is not None:
-            delta = round(fund_perf - etf_perf, 4)  # In decimale
-            beats_etf = delta > 0
-        else:
-            delta = None
-            beats_etf = None
-
-        result = ComparisonResult(
-            instrument=fund,
+    if arrays is not None:
+        fund_perf = arrays.period(period)
+        isins = arrays.isin
+    else:
+        # None -> NaN nella conversione a float64
+        fund_perf = np.array(
+            list(map(universe_period_getter(period), universe)), dtype=np.float64
+        )
+        isins = np.array([fund.isin for fund in universe], dtype=object)
+
+    # Escludi l'ETF stesso dal confronto
+    keep = np.flatnonzero(isins != etf_benchmark.isin)
+    fund_perf = fund_perf[keep]
+
+    # Delta (in decimale) solo dove entrambe le performance esistono: NaN
+    # altrimenti. Arrotondamento con round() di Python, come per il singolo
+    # valore, così i delta restano identici a quelli calcolati riga per riga
+    if etf_perf is None:
+        raw_delta = np.full(len(keep), np.nan)
+    else:
+        raw_delta = fund_perf - etf_perf
+    has_delta = ~np.isnan(raw_delta)
+    delta = raw_delta.copy()
+    delta[has_delta] = [round(d, 4) for d in raw_delta[has_delta].tolist()]
+    beats = delta > 0  # NaN -> False, filtrato da has_delta
+
+    n_beating = int(np.count_nonzero(beats))
+    n_with_data = int(np.count_nonzero(has_delta))
+
+    # Valori Python per i risultati: NaN -> None
+    perf_values = np.where(np.isnan(fund_perf), None, fund_perf).tolist()
+    delta_values = np.where(has_delta, delta, None).tolist()
+    beats_values = np.where(has_delta, beats, None).tolist()
+
+    results = [
+        ComparisonResult(
+            instrument=universe[i],
             etf_performance=etf_perf,
-            fund_performance=fund_perf,
-            delta=delta,
-            beats_etf=beats_etf
+            fund_performance=perf,
+            delta=d,
+            beats_etf=b
         )
-
-        report.results.append(result)
+        for i, perf, d, b in zip(
+            keep.tolist(), perf_values, delta_values, beats_values
+        )
+    ]
+    report = ComparisonReport(
+        etf_benchmark=etf_benchmark,
+        period=period,
+        period_label=period_label,
+        results=results
+    )
+    # Gli aggregati del report (conteggi, medie, migliore/peggiore) lavorano
+    # sull'array dei delta già calcolato, senza ripercorrere i risultati
+    report._cache["deltas"] = delta
 
     logger.info(
-        f"Confronto completato: {report.funds_beating_etf} battono ETF, "
-        f"{report.funds_not_beating_etf} non battono, {report.funds_no_data} N/A"
+        f"Confronto completato: {n_beating} battono ETF, "
+        f"{n_with_data - n_beating} non battono, "
+        f"{len(keep) - n_with_data} N/A"
     )
 
     return report
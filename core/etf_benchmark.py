@@ -5,19 +5,44 @@ Questo modulo gestisce il recupero dei dati ETF per il confronto con
 l'universo fondi dell'utente. Cerca prima nell'universo caricato,
 poi nella cache locale, poi su fonti esterne se necessario.
 """
-from typing import Optional, List, Dict
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional, List, Dict, Tuple, Union
 from time import time
 from core.models import UniverseInstrument
-from core.universe_loader import validate_isin
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Cache locale per ETF pre-caricati
-# Struttura: {isin: {'data': UniverseInstrument, 'timestamp': float}}
-_etf_cache: Dict[str, dict] = {}
+# Cache locale per ETF pre-caricati, in ordine di inserimento
+# Struttura: {isin: (timestamp, UniverseInstrument)}
+_etf_cache: "OrderedDict[str, Tuple[float, UniverseInstrument]]" = OrderedDict()
 _cache_ttl: int = 86400  # 24 ore
 
+# Thread per il pre-caricamento in parallelo degli ETF da fonti esterne
+PRELOAD_MAX_WORKERS: int = 4
+
+
+def _canonical_isin(isin: str) -> str:
+    """Forma canonica di un ISIN (chiave di indice e cache): strip e maiuscolo."""
+    return isin.strip().upper()
+
+
+def _expire_etf_cache(now: float) -> None:
+    """
+    Rimuove le voci scadute dalla cache.
+
+    Le voci sono tenute in ordine di inserimento e hanno tutte lo stesso
+    TTL, quindi quelle scadute sono in testa: ci si ferma alla prima
+    ancora valida senza scorrere l'intera cache.
+    """
+    while _etf_cache:
+        timestamp, _ = next(iter(_etf_cache.values()))
+        if now - timestamp < _cache_ttl:
+            break
+        _etf_cache.popitem(last=False)
+
 
 def get_etf_cache_status() -> dict:
     """
@@ -27,23 +52,15 @@ def get_etf_cache_status() -> dict:
         dict con: count (int), isins (list), expires_in_minutes (int o None)
     """
     now = time()
-    valid_entries = {}
-
-    for isin, entry in _etf_cache.items():
-        if now - entry['timestamp'] < _cache_ttl:
-            valid_entries[isin] = entry
-
-    # Pulisci cache scaduta
-    _etf_cache.clear()
-    _etf_cache.update(valid_entries)
+    _expire_etf_cache(now)
 
-    if valid_entries:
-        # Trova il tempo rimanente minimo
-        oldest_timestamp = min(e['timestamp'] for e in valid_entries.values())
+    if _etf_cache:
+        # La voce più vecchia è la prima e scade per prima
+        oldest_timestamp, _ = next(iter(_etf_cache.values()))
         remaining = _cache_ttl - (now - oldest_timestamp)
         return {
-            'count': len(valid_entries),
-            'isins': list(valid_entries.keys()),
+            'count': len(_etf_cache),
+            'isins': list(_etf_cache),
             'expires_in_minutes': max(0, int(remaining / 60)),
         }
 
@@ -64,13 +81,18 @@ def find_etf_in_cache(isin: str) -> Optional[UniverseInstrument]:
     Returns:
         UniverseInstrument se trovato e non scaduto, None altrimenti
     """
-    isin_upper = isin.strip().upper()
+    return _find_etf_in_cache_raw(_canonical_isin(isin))
+
+
+def _find_etf_in_cache_raw(isin_upper: str) -> Optional[UniverseInstrument]:
+    """find_etf_in_cache per un ISIN già in forma canonica."""
     entry = _etf_cache.get(isin_upper)
 
     if entry:
-        if time() - entry['timestamp'] < _cache_ttl:
+        timestamp, etf = entry
+        if time() - timestamp < _cache_ttl:
             logger.debug(f"ETF {isin_upper} trovato in cache locale")
-            return entry['data']
+            return etf
         else:
             # Cache scaduta, rimuovi
             del _etf_cache[isin_upper]
@@ -86,11 +108,10 @@ def add_etf_to_cache(isin: str, etf_data: UniverseInstrument) -> None:
         isin: ISIN dell'ETF
         etf_data: Dati dell'ETF
     """
-    isin_upper = isin.strip().upper()
-    _etf_cache[isin_upper] = {
-        'data': etf_data,
-        'timestamp': time(),
-    }
+    isin_upper = _canonical_isin(isin)
+    _etf_cache[isin_upper] = (time(), etf_data)
+    # Un ETF ricaricato diventa la voce più recente
+    _etf_cache.move_to_end(isin_upper)
     logger.info(f"ETF {isin_upper} aggiunto alla cache locale")
 
 
@@ -100,21 +121,48 @@ def clear_etf_cache() -> None:
     logger.info("Cache ETF locale svuotata")
 
 
+def build_universe_index(
+    universe: List[UniverseInstrument]
+) -> Dict[str, UniverseInstrument]:
+    """
+    Indice ISIN -> strumento dell'universo, per lookup O(1).
+
+    A parità di ISIN vale il primo strumento, come nella scansione lineare.
+
+    Args:
+        universe: Lista strumenti dell'universo
+
+    Returns:
+        Dict ISIN -> UniverseInstrument
+    """
+    return {inst.isin: inst for inst in reversed(universe)}
+
+
 def find_etf_in_universe(
     isin: str,
-    universe: List[UniverseInstrument]
+    universe: Union[List[UniverseInstrument], Dict[str, UniverseInstrument]]
 ) -> Optional[UniverseInstrument]:
     """
     Cerca l'ETF nell'universo caricato.
 
     Args:
         isin: ISIN dell'ETF da cercare
-        universe: Lista strumenti dell'universo
+        universe: Lista strumenti dell'universo, oppure l'indice per ISIN
+            di build_universe_index (lookup O(1) invece della scansione)
 
     Returns:
         UniverseInstrument se trovato, None altrimenti
     """
-    isin_upper = isin.strip().upper()
+    return _find_etf_in_universe_raw(_canonical_isin(isin), universe)
+
+
+def _find_etf_in_universe_raw(
+    isin_upper: str,
+    universe: Union[List[UniverseInstrument], Dict[str, UniverseInstrument]]
+) -> Optional[UniverseInstrument]:
+    """find_etf_in_universe per un ISIN già in forma canonica."""
+    if isinstance(universe, dict):
+        return universe.get(isin_upper)
 
     for inst in universe:
         if inst.isin == isin_upper:
@@ -130,14 +178,81 @@ def _has_useful_performance(result) -> bool:
     Questo evita di accettare risultati che hanno solo metadati ma nessuna
     performance, permettendo di provare altre fonti.
     """
-    if not result or not result.performance:
+    if not result:
         return False
     perf = result.performance
-    return any([
-        perf.return_1y is not None,
-        perf.return_3y is not None,
-        perf.return_5y is not None,
-    ])
+    if not perf:
+        return False
+    # Catena di or: si ferma al primo periodo disponibile
+    return (
+        perf.return_1y is not None
+        or perf.return_3y is not None
+        or perf.return_5y is not None
+    )
+
+
+@lru_cache(maxsize=None)
+def _get_justetf_scraper():
+    """
+    Istanza condivisa dello scraper JustETF, creata al primo uso.
+
+    Condividerla mantiene la cache dell'overview tra una ricerca e l'altra
+    invece di riscaricarla per ogni ETF.
+    """
+    from scrapers.justetf_scraper import JustETFScraper
+    return JustETFScraper()
+
+
+@lru_cache(maxsize=None)
+def _get_morningstar_scraper():
+    """
+    Istanza condivisa dello scraper Morningstar, creata al primo uso.
+
+    Può essere usata in contemporanea dai thread del preload: get_by_isin
+    crea i propri oggetti mstarpy per chiamata, il rate limit dell'istanza
+    è protetto da lock e l'unico altro stato (disponibilità di mstarpy) è
+    un flag idempotente.
+    """
+    from scrapers.morningstar_scraper import MorningstarScraper
+    return MorningstarScraper()
+
+
+def _record_to_etf_data(result) -> dict:
+    """Dati ETF (nome, categoria, performance EUR) da un SourceRecord."""
+    perf = result.performance
+    return {
+        "name": result.name,
+        "category_morningstar": result.category_morningstar,
+        "perf_ytd_eur": perf.ytd,
+        "perf_1m_eur": perf.return_1m,
+        "perf_3m_eur": perf.return_3m,
+        "perf_6m_eur": perf.return_6m,
+        "perf_1y_eur": perf.return_1y,
+        "perf_3y_eur": perf.return_3y,
+        "perf_5y_eur": perf.return_5y,
+        "perf_7y_eur": perf.return_7y,
+        "perf_9y_eur": perf.return_9y,
+        "perf_10y_eur": perf.return_10y,
+    }
+
+
+def _etf_from_external_data(isin: str, external_data: dict) -> UniverseInstrument:
+    """UniverseInstrument da un dict di get_etf_from_external_sources."""
+    return UniverseInstrument(
+        isin=isin,
+        name=external_data.get("name", isin),
+        category_morningstar=external_data.get("category_morningstar"),
+        perf_ytd=external_data.get("perf_ytd_eur"),
+        perf_1m=external_data.get("perf_1m_eur"),
+        perf_3m=external_data.get("perf_3m_eur"),
+        perf_6m=external_data.get("perf_6m_eur"),
+        perf_1y=external_data.get("perf_1y_eur"),
+        perf_3y=external_data.get("perf_3y_eur"),
+        perf_5y=external_data.get("perf_5y_eur"),
+        perf_7y=external_data.get("perf_7y_eur"),
+        perf_9y=external_data.get("perf_9y_eur"),
+        perf_10y=external_data.get("perf_10y_eur"),
+    )
 
 
 def get_etf_from_external_sources(isin: str) -> Optional[dict]:
@@ -153,27 +268,17 @@ def get_etf_from_external_sources(isin: str) -> Optional[dict]:
     Returns:
         Dict con dati ETF o None se non trovato
     """
+    # Nessuna attesa qui: il rate limit si applica solo alle richieste di
+    # rete, dentro gli scraper condivisi (download dell'overview JustETF,
+    # chiamate Morningstar); il lookup JustETF per ISIN è in memoria
+
     # Prova prima JustETF (fonte primaria per ETF con dati più completi)
     try:
-        from scrapers.justetf_scraper import JustETFScraper
-        scraper = JustETFScraper()
+        scraper = _get_justetf_scraper()
         result = scraper.get_by_isin(isin)
         if result and _has_useful_performance(result):
             logger.info(f"ETF {isin} trovato su JustETF con performance")
-            return {
-                "name": result.name,
-                "category_morningstar": result.category_morningstar,
-                "perf_ytd_eur": result.performance.ytd,
-                "perf_1m_eur": result.performance.return_1m,
-                "perf_3m_eur": result.performance.return_3m,
-                "perf_6m_eur": result.performance.return_6m,
-                "perf_1y_eur": result.performance.return_1y,
-                "perf_3y_eur": result.performance.return_3y,
-                "perf_5y_eur": result.performance.return_5y,
-                "perf_7y_eur": result.performance.return_7y,
-                "perf_9y_eur": result.performance.return_9y,
-                "perf_10y_eur": result.performance.return_10y,
-            }
+            return _record_to_etf_data(result)
         elif result:
             logger.info(f"ETF {isin} trovato su JustETF ma senza performance utili")
     except Exception as e:
@@ -181,25 +286,11 @@ def get_etf_from_external_sources(isin: str) -> Optional[dict]:
 
     # Fallback a Morningstar
     try:
-        from scrapers.morningstar_scraper import MorningstarScraper
-        scraper = MorningstarScraper()
+        scraper = _get_morningstar_scraper()
         result = scraper.get_by_isin(isin)
         if result and _has_useful_performance(result):
             logger.info(f"ETF {isin} trovato su Morningstar con performance")
-            return {
-                "name": result.name,
-                "category_morningstar": result.category_morningstar,
-                "perf_ytd_eur": result.performance.ytd,
-                "perf_1m_eur": result.performance.return_1m,
-                "perf_3m_eur": result.performance.return_3m,
-                "perf_6m_eur": result.performance.return_6m,
-                "perf_1y_eur": result.performance.return_1y,
-                "perf_3y_eur": result.performance.return_3y,
-                "perf_5y_eur": result.performance.return_5y,
-                "perf_7y_eur": result.performance.return_7y,
-                "perf_9y_eur": result.performance.return_9y,
-                "perf_10y_eur": result.performance.return_10y,
-            }
+            return _record_to_etf_data(result)
         elif result:
             logger.info(f"ETF {isin} trovato su Morningstar ma senza performance utili")
     except Exception as e:
@@ -210,7 +301,7 @@ def get_etf_from_external_sources(isin: str) -> Optional[dict]:
 
 def get_etf_benchmark(
     isin: str,
-    universe: List[UniverseInstrument],
+    universe: Union[List[UniverseInstrument], Dict[str, UniverseInstrument]],
     use_cache: bool = True
 ) -> Optional[UniverseInstrument]:
     """
@@ -223,28 +314,32 @@ def get_etf_benchmark(
 
     Args:
         isin: ISIN dell'ETF benchmark
-        universe: Lista strumenti dell'universo
+        universe: Lista strumenti dell'universo o indice per ISIN
+            (build_universe_index)
         use_cache: Se True, cerca anche nella cache locale
 
     Returns:
         UniverseInstrument con dati ETF o None se non trovato
     """
+    # Import locale: il loader porta con sé pandas, superfluo all'avvio
+    from core.universe_loader import validate_isin
+
     # Valida formato ISIN
     if not validate_isin(isin):
         logger.warning(f"ISIN non valido: {isin}")
         return None
 
-    isin_upper = isin.strip().upper()
+    isin_upper = _canonical_isin(isin)
 
     # 1. Cerca nell'universo (piu' veloce e dati consistenti)
-    etf = find_etf_in_universe(isin_upper, universe)
+    etf = _find_etf_in_universe_raw(isin_upper, universe)
     if etf:
         logger.info(f"ETF {isin_upper} trovato nell'universo: {etf.name}")
         return etf
 
     # 2. Cerca nella cache locale (se abilitata)
     if use_cache:
-        etf = find_etf_in_cache(isin_upper)
+        etf = _find_etf_in_cache_raw(isin_upper)
         if etf:
             logger.info(f"ETF {isin_upper} trovato in cache: {etf.name}")
             return etf
@@ -255,21 +350,7 @@ def get_etf_benchmark(
 
     if external_data:
         # Converti in UniverseInstrument
-        etf = UniverseInstrument(
-            isin=isin_upper,
-            name=external_data.get("name", isin_upper),
-            category_morningstar=external_data.get("category_morningstar"),
-            perf_ytd=external_data.get("perf_ytd_eur"),
-            perf_1m=external_data.get("perf_1m_eur"),
-            perf_3m=external_data.get("perf_3m_eur"),
-            perf_6m=external_data.get("perf_6m_eur"),
-            perf_1y=external_data.get("perf_1y_eur"),
-            perf_3y=external_data.get("perf_3y_eur"),
-            perf_5y=external_data.get("perf_5y_eur"),
-            perf_7y=external_data.get("perf_7y_eur"),
-            perf_9y=external_data.get("perf_9y_eur"),
-            perf_10y=external_data.get("perf_10y_eur"),
-        )
+        etf = _etf_from_external_data(isin_upper, external_data)
 
         # Salva in cache per usi futuri
         add_etf_to_cache(isin_upper, etf)
@@ -283,17 +364,40 @@ def preload_etf_list(isins: List[str]) -> dict:
     """
     Pre-carica una lista di ETF nella cache locale.
 
+    Gli ETF da cercare su fonti esterne sono scaricati in parallelo da un
+    pool di thread (richieste I/O-bound); il rate limit per fonte resta
+    garantito dagli scraper condivisi, sulle sole richieste di rete.
+    Cache e risultati sono aggiornati dal thread chiamante, nell'ordine
+    della lista.
+
     Args:
         isins: Lista di ISIN da pre-caricare
 
     Returns:
         dict con: loaded (list), failed (list), total (int)
     """
+    from core.universe_loader import validate_isin
+
+    isins_clean = [_canonical_isin(isin) for isin in isins]
+
+    # ISIN validi non ancora in cache, senza duplicati
+    to_fetch = list(dict.fromkeys(
+        isin for isin in isins_clean
+        if isin and validate_isin(isin) and not _find_etf_in_cache_raw(isin)
+    ))
+    fetched: Dict[str, Optional[dict]] = {}
+    if to_fetch:
+        with ThreadPoolExecutor(
+            max_workers=min(PRELOAD_MAX_WORKERS, len(to_fetch))
+        ) as executor:
+            fetched = dict(zip(
+                to_fetch, executor.map(get_etf_from_external_sources, to_fetch)
+            ))
+
     loaded = []
     failed = []
 
-    for isin in isins:
-        isin_clean = isin.strip().upper()
+    for isin_clean in isins_clean:
         if not isin_clean:
             continue
 
@@ -302,29 +406,16 @@ def preload_etf_list(isins: List[str]) -> dict:
             continue
 
         # Controlla se già in cache
-        if find_etf_in_cache(isin_clean):
-            loaded.append({'isin': isin_clean, 'name': _etf_cache[isin_clean]['data'].name, 'cached': True})
+        cached_etf = _find_etf_in_cache_raw(isin_clean)
+        if cached_etf:
+            loaded.append({'isin': isin_clean, 'name': cached_etf.name, 'cached': True})
             continue
 
-        # Cerca su fonti esterne
-        external_data = get_etf_from_external_sources(isin_clean)
+        # Dati scaricati dalle fonti esterne
+        external_data = fetched.get(isin_clean)
 
         if external_data:
-            etf = UniverseInstrument(
-                isin=isin_clean,
-                name=external_data.get("name", isin_clean),
-                category_morningstar=external_data.get("category_morningstar"),
-                perf_ytd=external_data.get("perf_ytd_eur"),
-                perf_1m=external_data.get("perf_1m_eur"),
-                perf_3m=external_data.get("perf_3m_eur"),
-                perf_6m=external_data.get("perf_6m_eur"),
-                perf_1y=external_data.get("perf_1y_eur"),
-                perf_3y=external_data.get("perf_3y_eur"),
-                perf_5y=external_data.get("perf_5y_eur"),
-                perf_7y=external_data.get("perf_7y_eur"),
-                perf_9y=external_data.get("perf_9y_eur"),
-                perf_10y=external_data.get("perf_10y_eur"),
-            )
+            etf = _etf_from_external_data(isin_clean, external_data)
             add_etf_to_cache(isin_clean, etf)
             loaded.append({'isin': isin_clean, 'name': etf.name, 'cached': False})
         else:
@@ -7,9 +7,10 @@ Questo modulo definisce tutti i dataclass utilizzati nel sistema:
 - SearchCriteria: criteri di ricerca dall'interfaccia utente
 """
 from dataclasses import dataclass, field
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Callable
 from datetime import datetime
 from enum import Enum
+from operator import attrgetter, itemgetter
 import re
 
 
@@ -27,6 +28,38 @@ class DistributionPolicy(Enum):
     UNKNOWN = "UNKNOWN"
 
 
+# Codice periodo -> attributo performance/delta. Mappe costruite una volta
+# sola: i metodi *_by_period fanno un lookup e un getattr invece di creare a
+# ogni chiamata un dizionario con tutti e dieci i periodi.
+PERIOD_CODES = ("1m", "3m", "6m", "ytd", "1y", "3y", "5y", "7y", "9y", "10y")
+AGGREGATED_PERIOD_ATTRS: Dict[str, str] = {
+    code: f"perf_{code}_eur" for code in PERIOD_CODES
+}
+UNIVERSE_PERIOD_ATTRS: Dict[str, str] = {
+    code: f"perf_{code}" for code in PERIOD_CODES
+}
+PERFORMANCE_DATA_PERIOD_ATTRS: Dict[str, str] = {
+    code: "ytd" if code == "ytd" else f"return_{code}" for code in PERIOD_CODES
+}
+DELTA_PERIOD_ATTRS: Dict[str, str] = {
+    code: f"delta_{code}" for code in PERIOD_CODES
+}
+
+
+def universe_period_getter(period: str) -> Callable[[Any], Optional[float]]:
+    """
+    Getter della performance di UniverseInstrument per un periodo.
+
+    Equivale a get_performance_by_period, ma il periodo è risolto una sola
+    volta: nei cicli su molti strumenti resta un attrgetter per oggetto,
+    senza chiamata di metodo né lookup del periodo.
+    """
+    attr = UNIVERSE_PERIOD_ATTRS.get(period)
+    if attr is None:
+        return lambda inst: None
+    return attrgetter(attr)
+
+
 @dataclass
 class PerformanceData:
     """Performance su diversi orizzonti temporali (in percentuale)."""
@@ -43,19 +76,8 @@ class PerformanceData:
 
     def get_by_period(self, period: str) -> Optional[float]:
         """Restituisce la performance per il periodo specificato."""
-        mapping = {
-            "1m": self.return_1m,
-            "3m": self.return_3m,
-            "6m": self.return_6m,
-            "ytd": self.ytd,
-            "1y": self.return_1y,
-            "3y": self.return_3y,
-            "5y": self.return_5y,
-            "7y": self.return_7y,
-            "9y": self.return_9y,
-            "10y": self.return_10y,
-        }
-        return mapping.get(period)
+        attr = PERFORMANCE_DATA_PERIOD_ATTRS.get(period)
+        return getattr(self, attr) if attr else None
 
 
 @dataclass
@@ -106,7 +128,7 @@ class SourceRecord:
         return bool(re.match(pattern, self.isin))
 
 
-@dataclass
+@dataclass(slots=True)
 class AggregatedInstrument:
     """
     Record aggregato da multiple fonti.
@@ -147,19 +169,8 @@ class AggregatedInstrument:
 
     def get_performance_by_period(self, period: str) -> Optional[float]:
         """Restituisce la performance per il periodo specificato."""
-        mapping = {
-            "1m": self.perf_1m_eur,
-            "3m": self.perf_3m_eur,
-            "6m": self.perf_6m_eur,
-            "ytd": self.perf_ytd_eur,
-            "1y": self.perf_1y_eur,
-            "3y": self.perf_3y_eur,
-            "5y": self.perf_5y_eur,
-            "7y": self.perf_7y_eur,
-            "9y": self.perf_9y_eur,
-            "10y": self.perf_10y_eur,
-        }
-        return mapping.get(period)
+        attr = AGGREGATED_PERIOD_ATTRS.get(period)
+        return getattr(self, attr) if attr else None
 
     def to_dict(self) -> Dict[str, Any]:
         """Converte in dizionario per export."""
@@ -219,6 +230,23 @@ class SearchCriteria:
             "types": [t.value for t in self.instrument_types],
         }
 
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SearchCriteria":
+        """Ricostruisce i criteri dal dict prodotto da to_dict()."""
+        distribution = data.get("distribution")
+        return cls(
+            categories_morningstar=list(data.get("categories_ms", [])),
+            categories_assogestioni=list(data.get("categories_ag", [])),
+            currencies=list(data.get("currencies", ["EUR"])),
+            distribution_filter=DistributionPolicy(distribution) if distribution else None,
+            min_performance=data.get("min_perf"),
+            performance_period=data.get("perf_period", "3y"),
+            instrument_types=[
+                InstrumentType(t)
+                for t in data.get("types", [InstrumentType.ETF.value, InstrumentType.FUND.value])
+            ],
+        )
+
     def has_category_filter(self) -> bool:
         """Verifica se sono stati specificati filtri per categoria."""
         return bool(self.categories_morningstar or self.categories_assogestioni)
@@ -228,7 +256,7 @@ class SearchCriteria:
 # MODELLI v3.0 - Universo Fondi e Confronto
 # =============================================================================
 
-@dataclass
+@dataclass(slots=True)
 class UniverseInstrument:
     """
     Strumento caricato dall'universo utente (file Excel).
@@ -278,19 +306,8 @@ class UniverseInstrument:
         Returns:
             Performance in percentuale o None
         """
-        mapping = {
-            "1m": self.perf_1m,
-            "3m": self.perf_3m,
-            "6m": self.perf_6m,
-            "ytd": self.perf_ytd,
-            "1y": self.perf_1y,
-            "3y": self.perf_3y,
-            "5y": self.perf_5y,
-            "7y": self.perf_7y,
-            "9y": self.perf_9y,
-            "10y": self.perf_10y,
-        }
-        return mapping.get(period)
+        attr = UNIVERSE_PERIOD_ATTRS.get(period)
+        return getattr(self, attr) if attr else None
 
     def to_dict(self) -> Dict[str, Any]:
         """Converte in dizionario per export/display."""
@@ -393,19 +410,8 @@ class ComparisonResult:
 
     def get_delta_by_period(self, period: str) -> Optional[float]:
         """Restituisce il delta per il periodo specificato."""
-        mapping = {
-            "1m": self.delta_1m,
-            "3m": self.delta_3m,
-            "6m": self.delta_6m,
-            "ytd": self.delta_ytd,
-            "1y": self.delta_1y,
-            "3y": self.delta_3y,
-            "5y": self.delta_5y,
-            "7y": self.delta_7y,
-            "9y": self.delta_9y,
-            "10y": self.delta_10y,
-        }
-        return mapping.get(period)
+        attr = DELTA_PERIOD_ATTRS.get(period)
+        return getattr(self, attr) if attr else None
 
     def is_outperformer(self, period: str = "3y", threshold: float = 0.5) -> Optional[bool]:
         """
@@ -493,26 +499,31 @@ class ComparisonReport:
             if r.is_outperformer(reference_period, threshold=-0.5) is False
         )
 
-        # Calcola media delta per ogni periodo
-        periods = ["1m", "3m", "6m", "ytd", "1y", "3y", "5y", "7y", "9y", "10y"]
-        for period in periods:
+        # Calcola media delta per ogni periodo (attributo risolto una volta)
+        for period, attr in DELTA_PERIOD_ATTRS.items():
             deltas: List[float] = [
-                d for d in (r.get_delta_by_period(period) for r in universe_results)
+                d for d in map(attrgetter(attr), universe_results)
                 if d is not None
             ]
             if deltas:
                 self.avg_delta[period] = sum(deltas) / len(deltas)
 
         # Trova best/worst performer
-        ref_deltas: List[tuple] = [
-            (r, r.get_delta_by_period(reference_period))
-            for r in universe_results
-            if r.get_delta_by_period(reference_period) is not None
-        ]
+        ref_attr = DELTA_PERIOD_ATTRS.get(reference_period)
+        ref_deltas: List[tuple] = []
+        if ref_attr:
+            ref_deltas = [
+                (r, d)
+                for r, d in zip(
+                    universe_results, map(attrgetter(ref_attr), universe_results)
+                )
+                if d is not None
+            ]
         if ref_deltas:
-            ref_deltas.sort(key=lambda x: x[1] if x[1] is not None else 0.0, reverse=True)
-            self.best_performer = ref_deltas[0][0]
-            self.worst_performer = ref_deltas[-1][0]
+            # Due passate lineari invece dell'ordinamento completo; a parità
+            # di delta come prima: best è il primo, worst l'ultimo
+            self.best_performer = max(ref_deltas, key=itemgetter(1))[0]
+            self.worst_performer = min(reversed(ref_deltas), key=itemgetter(1))[0]
 
     def to_dataframe(self):
         """Converte i risultati in DataFrame pandas."""
@@ -15,19 +15,28 @@ Formato supportato (es. giada1.xlsx):
 """
 import re
 import logging
+from dataclasses import dataclass
 from io import BytesIO
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 
+import numpy as np
 import pandas as pd
 
-from core.models import UniverseInstrument, UniverseLoadResult
-from config import UNIVERSE_MAX_ISINS, UNIVERSE_ALLOWED_EXTENSIONS
+from core.models import UniverseInstrument, UniverseLoadResult, universe_period_getter
+from config import (
+    UNIVERSE_MAX_ISINS,
+    UNIVERSE_ALLOWED_EXTENSIONS,
+    PERFORMANCE_PERIOD_CODES,
+)
 
 logger = logging.getLogger(__name__)
 
 # Pattern ISIN: 2 lettere paese + 9 alfanumerici + 1 digit
 ISIN_PATTERN = re.compile(r'^[A-Z]{2}[A-Z0-9]{9}[0-9]$')
 
+# Ordine delle colonne della matrice performance di UniverseArrays
+PERIOD_INDEX = {code: idx for idx, code in enumerate(PERFORMANCE_PERIOD_CODES)}
+
 
 class UniverseLoader:
     """
@@ -39,6 +48,9 @@ class UniverseLoader:
 
     MAX_ISINS = UNIVERSE_MAX_ISINS
 
+    # Disponibilità di python-calamine, verificata al primo parse
+    _calamine_available: Optional[bool] = None
+
     # Mapping colonne Excel -> attributi modello
     # Formato: nome_attributo -> lista possibili nomi colonne
     COLUMN_MAPPINGS: Dict[str, List[str]] = {
@@ -115,7 +127,8 @@ class UniverseLoader:
         Carica universo da file Excel.
 
         Args:
-            file: BytesIO con contenuto file Excel
+            file: File binario con contenuto Excel (BytesIO o UploadedFile
+                di Streamlit, passato così com'è senza copiarne i byte)
             filename: Nome originale del file (per messaggi errore)
 
         Returns:
@@ -169,8 +182,10 @@ class UniverseLoader:
         detected_cols = list(column_map.keys())
         logger.info(f"Colonne rilevate: {detected_cols}")
 
-        # Processa ogni riga
-        for row_idx, (_, row) in enumerate(df.iterrows()):
+        # Processa ogni riga: solo le colonne rilevate, come dizionari di
+        # valori Python (niente Series per riga come con iterrows)
+        records = df[list(dict.fromkeys(column_map.values()))].to_dict("records")
+        for row_idx, row in enumerate(records):
             row_num = row_idx + 2  # +2 per header e indice 0-based
 
             # Estrai ISIN
@@ -206,7 +221,7 @@ class UniverseLoader:
 
     def _row_to_instrument(
         self,
-        row: pd.Series,
+        row: Dict[str, Any],
         column_map: Dict[str, str],
         isin: str,
         row_num: int
@@ -215,7 +230,7 @@ class UniverseLoader:
         Converte una riga DataFrame in UniverseInstrument.
 
         Args:
-            row: Riga del DataFrame
+            row: Riga del DataFrame (colonna -> valore)
             column_map: Mapping attributo -> nome colonna
             isin: ISIN validato
             row_num: Numero riga nel file
@@ -296,13 +311,33 @@ class UniverseLoader:
 
         return result
 
+    def _check_calamine(self) -> bool:
+        """Verifica se python-calamine è disponibile."""
+        if UniverseLoader._calamine_available is None:
+            try:
+                import python_calamine  # noqa: F401
+                UniverseLoader._calamine_available = True
+            except ImportError:
+                logger.info("python-calamine not installed, using openpyxl")
+                UniverseLoader._calamine_available = False
+        return UniverseLoader._calamine_available
+
     def _parse_excel(self, file: BytesIO) -> pd.DataFrame:
         """
         Parse file Excel in DataFrame.
 
-        Prova prima .xlsx poi .xls se necessario.
+        Usa python-calamine (parser Rust, legge sia .xlsx sia .xls) se
+        installato; altrimenti prova .xlsx con openpyxl (che pandas apre già
+        in read_only/data_only) e poi .xls.
         """
         file.seek(0)
+        if self._check_calamine():
+            try:
+                return pd.read_excel(file, engine='calamine')
+            except Exception as e:
+                # Es. pandas < 2.2 senza engine calamine: si ripiega su openpyxl
+                logger.debug(f"calamine read failed, falling back: {e}")
+                file.seek(0)
         try:
             # Prova formato xlsx
             return pd.read_excel(file, engine='openpyxl')
@@ -418,10 +453,125 @@ def get_unique_isins(instruments: List[UniverseInstrument]) -> List[str]:
     return result
 
 
-def group_by_category(instruments: List[UniverseInstrument]) -> dict:
+@dataclass
+class UniverseArrays:
+    """
+    Vista colonnare (SoA) dell'universo, allineata per indice alla lista
+    di strumenti da cui è costruita.
+
+    Filtri, ordinamenti, statistiche e tabella/export dei fondi lavorano su
+    questi array in NumPy; la lista di UniverseInstrument resta per il
+    confronto con l'ETF.
+    """
+    isin: np.ndarray          # ISIN (U12)
+    name: np.ndarray          # Nome (object, ISIN se assente)
+    category: pd.Categorical  # Categoria Morningstar ("" se assente)
+    sfdr: pd.Categorical      # Categoria SFDR ("" se assente)
+    performance: np.ndarray   # float64 (n, periodi), NaN se mancante
+    ter: np.ndarray           # float64, NaN se mancante
+    var_3m: np.ndarray        # float64, NaN se mancante
+
+    @classmethod
+    def from_instruments(cls, instruments: List[UniverseInstrument]) -> "UniverseArrays":
+        """Costruisce gli array in un'unica passata sugli strumenti."""
+        n = len(instruments)
+        isin = np.empty(n, dtype="U12")
+        name = np.empty(n, dtype=object)
+        category = np.empty(n, dtype=object)
+        sfdr = np.empty(n, dtype=object)
+        # float64: stessi valori dei float Python, così medie e massimi
+        # calcolati sugli array coincidono con quelli sugli oggetti
+        performance = np.empty((n, len(PERFORMANCE_PERIOD_CODES)), dtype=np.float64)
+        ter = np.empty(n, dtype=np.float64)
+        var_3m = np.empty(n, dtype=np.float64)
+
+        # None assegnato a un array float64 diventa NaN
+        for i, inst in enumerate(instruments):
+            isin[i] = inst.isin
+            name[i] = inst.name or inst.isin
+            category[i] = inst.category_morningstar or ""
+            sfdr[i] = inst.category_sfdr or ""
+            performance[i] = (
+                inst.perf_1m, inst.perf_3m, inst.perf_6m, inst.perf_ytd,
+                inst.perf_1y, inst.perf_3y, inst.perf_5y, inst.perf_7y,
+                inst.perf_9y, inst.perf_10y,
+            )
+            ter[i] = inst.ter
+            var_3m[i] = inst.var_3m
+
+        # Categorie come codici interi + dizionario dei valori distinti:
+        # i confronti sulle stringhe girano solo sul dizionario
+        return cls(
+            isin=isin,
+            name=name,
+            category=pd.Categorical(category),
+            sfdr=pd.Categorical(sfdr),
+            performance=performance,
+            ter=ter,
+            var_3m=var_3m,
+        )
+
+    def __len__(self) -> int:
+        return len(self.isin)
+
+    def period(self, period: str) -> np.ndarray:
+        """Colonna performance per il codice periodo (1m, 3m, ..., 10y)."""
+        return self.performance[:, PERIOD_INDEX[period]]
+
+    def subset(self, indices: np.ndarray) -> "UniverseArrays":
+        """Sottoinsieme per indici o maschera booleana."""
+        return UniverseArrays(
+            isin=self.isin[indices],
+            name=self.name[indices],
+            category=self.category[indices],
+            sfdr=self.sfdr[indices],
+            performance=self.performance[indices],
+            ter=self.ter[indices],
+            var_3m=self.var_3m[indices],
+        )
+
+
+def category_groups(column: pd.Categorical) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Id di gruppo per riga di una colonna categorie.
+
+    Le categorie vuote confluiscono in "Senza Categoria"; gli id sono
+    assegnati in ordine di prima comparsa nelle righe.
+
+    Returns:
+        Tupla (id di gruppo per riga, etichette dei gruppi per id)
+    """
+    # Copia esplicita: np.asarray può restituire una vista sui valori
+    # dell'Index, e la sostituzione sotto altererebbe le categorie condivise
+    dictionary = np.array(column.categories, dtype=object)
+    dictionary[dictionary == ""] = "Senza Categoria"
+    # Un gruppo per voce del dizionario, poi per riga tramite i codici
+    dict_groups, labels = pd.factorize(dictionary)
+    row_groups = dict_groups[column.codes]
+    # pd.factorize sulle righe rinumera i gruppi per prima comparsa
+    group_ids, first_seen = pd.factorize(row_groups)
+    return group_ids, np.asarray(labels, dtype=object)[first_seen]
+
+
+def group_by_category(
+    instruments: List[UniverseInstrument],
+    arrays: Optional[UniverseArrays] = None
+) -> dict:
     """
     Raggruppa strumenti per categoria Morningstar.
+
+    Con la vista colonnare i gruppi si ricavano dai codici categoria con
+    un ordinamento stabile, senza leggere gli attributi degli strumenti.
     """
+    if arrays is not None:
+        group_ids, labels = category_groups(arrays.category)
+        order = np.argsort(group_ids, kind="stable")
+        bounds = np.flatnonzero(np.diff(group_ids[order])) + 1
+        return {
+            labels[group_ids[chunk[0]]]: [instruments[i] for i in chunk]
+            for chunk in np.split(order, bounds) if chunk.size
+        }
+
     groups: dict = {}
     for inst in instruments:
         cat = inst.category_morningstar or "Senza Categoria"
@@ -435,7 +585,8 @@ def filter_by_performance(
     instruments: List[UniverseInstrument],
     period: str,
     min_value: Optional[float] = None,
-    max_value: Optional[float] = None
+    max_value: Optional[float] = None,
+    arrays: Optional[UniverseArrays] = None
 ) -> List[UniverseInstrument]:
     """
     Filtra strumenti per performance nel periodo specificato.
@@ -445,13 +596,27 @@ def filter_by_performance(
         period: Codice periodo (1m, 3m, 6m, ytd, 1y, 3y, 5y, 7y, 9y, 10y)
         min_value: Performance minima (in decimale, es. 0.05 = 5%)
         max_value: Performance massima
+        arrays: Vista colonnare allineata a instruments (filtro vettoriale)
 
     Returns:
         Lista strumenti filtrati
     """
+    if arrays is not None:
+        perf = arrays.period(period)
+        mask = ~np.isnan(perf)
+        if min_value is not None:
+            mask &= perf >= min_value
+        if max_value is not None:
+            mask &= perf <= max_value
+        if mask.all():
+            # Nessuno strumento escluso: si restituisce la lista originale
+            return instruments
+        return [instruments[i] for i in np.flatnonzero(mask)]
+
+    get_perf = universe_period_getter(period)
     result = []
     for inst in instruments:
-        perf = inst.get_performance_by_period(period)
+        perf = get_perf(inst)
         if perf is None:
             continue
         if min_value is not None and perf < min_value:
@@ -462,11 +627,32 @@ def filter_by_performance(
     return result
 
 
+def rank_indices_by_performance(
+    arrays: UniverseArrays,
+    period: str,
+    ascending: bool = False,
+    top_n: Optional[int] = None
+) -> np.ndarray:
+    """
+    Indici degli strumenti ordinati per performance nel periodo.
+
+    Esclude i dati mancanti; con gli indici si riallineano sia la lista
+    di strumenti sia la vista colonnare (UniverseArrays.subset).
+    """
+    perf = arrays.period(period)
+    valid_idx = np.flatnonzero(~np.isnan(perf))
+    values = perf[valid_idx]
+    # argsort stabile: a parità di valore resta l'ordine originale
+    order = np.argsort(values if ascending else -values, kind="stable")
+    return valid_idx[order[:top_n] if top_n is not None else order]
+
+
 def rank_by_performance(
     instruments: List[UniverseInstrument],
     period: str,
     ascending: bool = False,
-    top_n: Optional[int] = None
+    top_n: Optional[int] = None,
+    arrays: Optional[UniverseArrays] = None
 ) -> List[UniverseInstrument]:
     """
     Ordina strumenti per performance nel periodo specificato.
@@ -476,14 +662,20 @@ def rank_by_performance(
         period: Codice periodo
         ascending: Se True, ordina dal peggiore al migliore
         top_n: Se specificato, restituisce solo i primi N
+        arrays: Vista colonnare allineata a instruments (ordinamento vettoriale)
 
     Returns:
         Lista strumenti ordinata
     """
-    # Filtra strumenti con performance valida
-    valid = [(inst, inst.get_performance_by_period(period))
-             for inst in instruments
-             if inst.get_performance_by_period(period) is not None]
+    if arrays is not None:
+        ranked = rank_indices_by_performance(arrays, period, ascending, top_n)
+        return [instruments[i] for i in ranked]
+
+    # Filtra strumenti con performance valida (un solo accesso per strumento)
+    get_perf = universe_period_getter(period)
+    valid = [(inst, perf)
+             for inst, perf in zip(instruments, map(get_perf, instruments))
+             if perf is not None]
 
     # Ordina
     sorted_list = sorted(valid, key=lambda x: x[1] or 0, reverse=not ascending)
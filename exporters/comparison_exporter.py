@@ -4,6 +4,7 @@ Comparison Exporter - Export Excel per report di confronto.
 Genera file Excel formattati per i confronti fondi vs ETF
 con formattazione condizionale per i delta e foglio riepilogo.
 """
+import numpy as np
 import pandas as pd
 from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill
@@ -194,7 +195,7 @@ class ComparisonExporter:
                     elif delta_value < -0.5:
                         cell.fill = self.red_fill
                 else:
-                    cell.value = "" if result.origin == "market" else ""
+                    cell.value = ""
 
             # Bordi e formattazione riga
             for col_idx in range(1, len(all_columns) + 1):
@@ -341,6 +342,11 @@ def comparison_to_dataframe(report: ComparisonReport) -> pd.DataFrame:
     """
     Converte ComparisonReport in DataFrame.
 
+    Costruzione colonnare: performance e delta sono matrici float64
+    (NaN per i mancanti) riempite riga per riga; i delta restano NaN per
+    gli strumenti non appartenenti all'universo. Tipo, origine e
+    categoria sono categoriche.
+
     Args:
         report: ComparisonReport da convertire
 
@@ -350,42 +356,52 @@ def comparison_to_dataframe(report: ComparisonReport) -> pd.DataFrame:
     if not report or not report.results:
         return pd.DataFrame()
 
-    data = []
-    for result in report.results:
+    n = len(report.results)
+    names = np.empty(n, dtype=object)
+    isins = np.empty(n, dtype=object)
+    types = np.empty(n, dtype=object)
+    origins = np.empty(n, dtype=object)
+    categories = np.empty(n, dtype=object)
+    perfs = np.empty((n, 10), dtype=np.float64)
+    deltas = np.full((n, 10), np.nan, dtype=np.float64)
+    has_universe = False
+
+    # None assegnato a un array float64 diventa NaN
+    for i, result in enumerate(report.results):
         inst = result.instrument
-        row = {
-            "Nome": inst.name,
-            "ISIN": inst.isin,
-            "Tipo": inst.instrument_type.value,
-            "Origine": result.origin.capitalize(),
-            "Categoria": inst.category_morningstar or inst.category_assogestioni or "",
-            "Perf. 1m": inst.perf_1m_eur,
-            "Perf. 3m": inst.perf_3m_eur,
-            "Perf. 6m": inst.perf_6m_eur,
-            "Perf. YTD": inst.perf_ytd_eur,
-            "Perf. 1a": inst.perf_1y_eur,
-            "Perf. 3a": inst.perf_3y_eur,
-            "Perf. 5a": inst.perf_5y_eur,
-            "Perf. 7a": inst.perf_7y_eur,
-            "Perf. 9a": inst.perf_9y_eur,
-            "Perf. 10a": inst.perf_10y_eur,
-        }
-
-        # Aggiungi delta solo per strumenti universo
+        names[i] = inst.name
+        isins[i] = inst.isin
+        types[i] = inst.instrument_type.value
+        origins[i] = result.origin.capitalize()
+        categories[i] = inst.category_morningstar or inst.category_assogestioni or ""
+        perfs[i] = (
+            inst.perf_1m_eur, inst.perf_3m_eur, inst.perf_6m_eur,
+            inst.perf_ytd_eur, inst.perf_1y_eur, inst.perf_3y_eur,
+            inst.perf_5y_eur, inst.perf_7y_eur, inst.perf_9y_eur,
+            inst.perf_10y_eur,
+        )
+
+        # Delta solo per strumenti universo
         if result.origin == "universe":
-            row.update({
-                "Delta 1m": result.delta_1m,
-                "Delta 3m": result.delta_3m,
-                "Delta 6m": result.delta_6m,
-                "Delta YTD": result.delta_ytd,
-                "Delta 1a": result.delta_1y,
-                "Delta 3a": result.delta_3y,
-                "Delta 5a": result.delta_5y,
-                "Delta 7a": result.delta_7y,
-                "Delta 9a": result.delta_9y,
-                "Delta 10a": result.delta_10y,
-            })
-
-        data.append(row)
-
-    return pd.DataFrame(data)
+            has_universe = True
+            deltas[i] = (
+                result.delta_1m, result.delta_3m, result.delta_6m,
+                result.delta_ytd, result.delta_1y, result.delta_3y,
+                result.delta_5y, result.delta_7y, result.delta_9y,
+                result.delta_10y,
+            )
+
+    columns = {
+        "Nome": names,
+        "ISIN": isins,
+        "Tipo": pd.Categorical(types),
+        "Origine": pd.Categorical(origins),
+        "Categoria": pd.Categorical(categories),
+    }
+    for col_idx, (header, _) in enumerate(ComparisonExporter.PERFORMANCE_COLUMNS):
+        columns[header] = perfs[:, col_idx]
+    if has_universe:
+        for col_idx, (header, _) in enumerate(ComparisonExporter.DELTA_COLUMNS):
+            columns[header] = deltas[:, col_idx]
+
+    return pd.DataFrame(columns)
@@ -8,9 +8,12 @@ Crea file Excel con:
 - Righe alternate
 - Foglio metadata
 """
+import numpy as np
 import pandas as pd
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
+from openpyxl.utils import get_column_letter
 from openpyxl.utils.dataframe import dataframe_to_rows
 from typing import List, Optional, Union
 from io import BytesIO
@@ -88,26 +91,22 @@ class ExcelWriter:
         """
         logger.info(f"Exporting {len(instruments)} instruments to Excel")
 
-        # Crea workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Risultati"
+        # Workbook in modalità write-only: le righe vengono serializzate man
+        # mano che si aggiungono, senza tenere in memoria l'albero delle celle
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Risultati")
 
-        # Scrivi header
-        self._write_headers(ws)
-
-        # Scrivi dati
-        self._write_data(ws, instruments)
-
-        # Applica formattazione
-        self._apply_formatting(ws, len(instruments))
-
-        # Auto-dimensiona colonne
+        # Larghezze e filtri vanno impostati prima di scrivere le righe
         self._auto_fit_columns(ws)
-
-        # Aggiungi filtri automatici
         self._add_auto_filter(ws, len(instruments))
 
+        # Scrivi header
+        ws.append(self._header_row(ws))
+
+        # Scrivi dati (già formattati)
+        for row in self._data_rows(ws, instruments):
+            ws.append(row)
+
         # Crea foglio metadata
         self._create_metadata_sheet(wb, len(instruments), filename)
 
@@ -119,35 +118,57 @@ class ExcelWriter:
         logger.info("Excel export completed")
         return buffer
 
-    def _write_headers(self, ws) -> None:
-        """Scrive e formatta la riga header."""
-        for col_idx, (header_name, _) in enumerate(self.COLUMNS, start=1):
-            cell = ws.cell(row=1, column=col_idx, value=header_name)
+    def _header_row(self, ws) -> List[WriteOnlyCell]:
+        """Crea la riga header formattata."""
+        row = []
+        for header_name, _ in self.COLUMNS:
+            cell = WriteOnlyCell(ws, value=header_name)
             cell.font = self.header_style['font']
             cell.fill = self.header_style['fill']
             cell.alignment = self.header_style['alignment']
             cell.border = self.header_style['border']
+            row.append(cell)
+        return row
+
+    def _data_rows(self, ws, instruments: List[AggregatedInstrument]):
+        """
+        Genera le righe dati con formattazione già applicata.
+
+        Stili costruiti una volta sola: righe alternate (escluse le colonne
+        performance), bordi, allineamento e colore delle performance.
+        """
+        left = Alignment(horizontal='left')
+        center = Alignment(horizontal='center')
+        right = Alignment(horizontal='right')
+        positive_font = get_performance_font(True)
+        negative_font = get_performance_font(False)
+        border = self.border
+        alt_fill = self.alt_row_fill
 
-    def _write_data(self, ws, instruments: List[AggregatedInstrument]) -> None:
-        """Scrive i dati nelle celle."""
         for row_idx, inst in enumerate(instruments, start=2):
-            # Nome
-            ws.cell(row=row_idx, column=1, value=inst.name)
-            # ISIN
-            ws.cell(row=row_idx, column=2, value=inst.isin)
-            # Tipo
-            ws.cell(row=row_idx, column=3, value=inst.instrument_type.value)
-            # Valuta
-            ws.cell(row=row_idx, column=4, value=inst.currency)
-            # Distribuzione
-            ws.cell(row=row_idx, column=5, value=inst.distribution.value)
-            # Categoria Morningstar
-            ws.cell(row=row_idx, column=6, value=inst.category_morningstar or "")
-            # Categoria Assogestioni
-            ws.cell(row=row_idx, column=7, value=inst.category_assogestioni or "")
+            striped = row_idx % 2 == 0
+            row = []
+
+            # Colonne testuali: Nome, ISIN, Tipo, Valuta, Distribuzione, Categorie
+            text_values = (
+                inst.name,
+                inst.isin,
+                inst.instrument_type.value,
+                inst.currency,
+                inst.distribution.value,
+                inst.category_morningstar or "",
+                inst.category_assogestioni or "",
+            )
+            for col_idx, value in enumerate(text_values):
+                cell = WriteOnlyCell(ws, value=value)
+                cell.border = border
+                cell.alignment = left if col_idx == 0 else center
+                if striped:
+                    cell.fill = alt_fill
+                row.append(cell)
 
             # Performance con formato percentuale (v3.0 con periodi estesi)
-            perf_values = [
+            perf_values = (
                 inst.perf_1m_eur,
                 inst.perf_3m_eur,
                 inst.perf_6m_eur,
@@ -158,57 +179,39 @@ class ExcelWriter:
                 inst.perf_7y_eur,
                 inst.perf_9y_eur,
                 inst.perf_10y_eur,
-            ]
-
-            for col_offset, perf_value in enumerate(perf_values):
-                cell = ws.cell(row=row_idx, column=8 + col_offset)
+            )
+            for perf_value in perf_values:
                 if perf_value is not None:
                     # Converti in decimale per formato percentuale
-                    cell.value = perf_value / 100
+                    cell = WriteOnlyCell(ws, value=perf_value / 100)
                     cell.number_format = '0.00%'
                     # Colore condizionale
-                    cell.font = get_performance_font(perf_value >= 0)
+                    cell.font = positive_font if perf_value >= 0 else negative_font
                 else:
-                    cell.value = ""
+                    cell = WriteOnlyCell(ws, value="")
+                cell.border = border
+                cell.alignment = right
+                row.append(cell)
 
             # Fonti
-            ws.cell(row=row_idx, column=18, value=", ".join(inst.sources))
-
-    def _apply_formatting(self, ws, row_count: int) -> None:
-        """Applica formattazione alle righe dati."""
-        for row_idx in range(2, row_count + 2):
-            # Righe alternate
-            if row_idx % 2 == 0:
-                for col_idx in range(1, len(self.COLUMNS) + 1):
-                    cell = ws.cell(row=row_idx, column=col_idx)
-                    # Non sovrascrivere fill delle performance
-                    if col_idx not in [c + 1 for c in self.PERF_COLUMNS]:
-                        cell.fill = self.alt_row_fill
-
-            # Bordi a tutte le celle
-            for col_idx in range(1, len(self.COLUMNS) + 1):
-                ws.cell(row=row_idx, column=col_idx).border = self.border
-
-            # Allineamento
-            for col_idx in range(1, len(self.COLUMNS) + 1):
-                cell = ws.cell(row=row_idx, column=col_idx)
-                if col_idx in [c + 1 for c in self.PERF_COLUMNS]:
-                    cell.alignment = Alignment(horizontal='right')
-                elif col_idx == 1:  # Nome
-                    cell.alignment = Alignment(horizontal='left')
-                else:
-                    cell.alignment = Alignment(horizontal='center')
+            cell = WriteOnlyCell(ws, value=", ".join(inst.sources))
+            cell.border = border
+            cell.alignment = center
+            if striped:
+                cell.fill = alt_fill
+            row.append(cell)
+
+            yield row
 
     def _auto_fit_columns(self, ws) -> None:
         """Imposta larghezza colonne."""
         for col_idx, (col_name, width) in enumerate(self.COLUMNS, start=1):
-            col_letter = ws.cell(row=1, column=col_idx).column_letter
-            ws.column_dimensions[col_letter].width = width
+            ws.column_dimensions[get_column_letter(col_idx)].width = width
 
     def _add_auto_filter(self, ws, row_count: int) -> None:
         """Aggiunge filtri automatici all'header."""
         if row_count > 0:
-            last_col_letter = ws.cell(row=1, column=len(self.COLUMNS)).column_letter
+            last_col_letter = get_column_letter(len(self.COLUMNS))
             ws.auto_filter.ref = f"A1:{last_col_letter}{row_count + 1}"
 
     def _create_metadata_sheet(
@@ -219,6 +222,8 @@ class ExcelWriter:
     ) -> None:
         """Crea foglio con metadati dell'export."""
         ws_meta = wb.create_sheet("Info")
+        ws_meta.column_dimensions['A'].width = 25
+        ws_meta.column_dimensions['B'].width = 35
 
         metadata = [
             ("Generato il", datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
@@ -231,12 +236,11 @@ class ExcelWriter:
         if filename:
             metadata.append(("Nome file", filename))
 
-        for row_idx, (key, value) in enumerate(metadata, start=1):
-            ws_meta.cell(row=row_idx, column=1, value=key).font = Font(bold=True)
-            ws_meta.cell(row=row_idx, column=2, value=value)
-
-        ws_meta.column_dimensions['A'].width = 25
-        ws_meta.column_dimensions['B'].width = 35
+        bold = Font(bold=True)
+        for key, value in metadata:
+            key_cell = WriteOnlyCell(ws_meta, value=key)
+            key_cell.font = bold
+            ws_meta.append([key_cell, value])
 
     def export_to_file(
         self,
@@ -266,36 +270,89 @@ def instruments_to_dataframe(instruments: List[AggregatedInstrument]) -> pd.Data
     """
     Converte lista strumenti in DataFrame.
 
+    Costruzione colonnare: ogni colonna è un array NumPy preallocato
+    (float64 con NaN per i valori mancanti, object per le stringhe)
+    riempito in un'unica passata sugli strumenti. Le colonne testuali con
+    pochi valori distinti (tipo, valuta, categorie, fonti) diventano
+    categoriche: codici interi più un piccolo dizionario.
+
     Args:
         instruments: Lista di AggregatedInstrument
 
     Returns:
         DataFrame pandas
     """
-    data = []
-    for inst in instruments:
-        data.append({
-            "Nome": inst.name,
-            "ISIN": inst.isin,
-            "Tipo": inst.instrument_type.value,
-            "Valuta": inst.currency,
-            "Distribuzione": inst.distribution.value,
-            "Cat. Morningstar": inst.category_morningstar or "",
-            "Cat. Assogestioni": inst.category_assogestioni or "",
-            "Perf. 1m": inst.perf_1m_eur,
-            "Perf. 3m": inst.perf_3m_eur,
-            "Perf. 6m": inst.perf_6m_eur,
-            "Perf. YTD": inst.perf_ytd_eur,
-            "Perf. 1a": inst.perf_1y_eur,
-            "Perf. 3a": inst.perf_3y_eur,
-            "Perf. 5a": inst.perf_5y_eur,
-            "Perf. 7a": inst.perf_7y_eur,
-            "Perf. 9a": inst.perf_9y_eur,
-            "Perf. 10a": inst.perf_10y_eur,
-            "Volatilita' 3a": inst.volatility_3y,
-            "Sharpe 3a": inst.sharpe_ratio_3y,
-            "Fonti": ", ".join(inst.sources),
-            "Qualita'": f"{inst.data_quality_score:.0f}%",
-        })
-
-    return pd.DataFrame(data)
+    n = len(instruments)
+    if n == 0:
+        return pd.DataFrame()
+
+    names = np.empty(n, dtype=object)
+    isins = np.empty(n, dtype=object)
+    types = np.empty(n, dtype=object)
+    currencies = np.empty(n, dtype=object)
+    distributions = np.empty(n, dtype=object)
+    cats_ms = np.empty(n, dtype=object)
+    cats_ag = np.empty(n, dtype=object)
+    sources = np.empty(n, dtype=object)
+    quality = np.empty(n, dtype=object)
+
+    perf_1m = np.empty(n, dtype=np.float64)
+    perf_3m = np.empty(n, dtype=np.float64)
+    perf_6m = np.empty(n, dtype=np.float64)
+    perf_ytd = np.empty(n, dtype=np.float64)
+    perf_1y = np.empty(n, dtype=np.float64)
+    perf_3y = np.empty(n, dtype=np.float64)
+    perf_5y = np.empty(n, dtype=np.float64)
+    perf_7y = np.empty(n, dtype=np.float64)
+    perf_9y = np.empty(n, dtype=np.float64)
+    perf_10y = np.empty(n, dtype=np.float64)
+    vol_3y = np.empty(n, dtype=np.float64)
+    sharpe = np.empty(n, dtype=np.float64)
+
+    # None assegnato a un array float64 diventa NaN
+    for i, inst in enumerate(instruments):
+        names[i] = inst.name
+        isins[i] = inst.isin
+        types[i] = inst.instrument_type.value
+        currencies[i] = inst.currency
+        distributions[i] = inst.distribution.value
+        cats_ms[i] = inst.category_morningstar or ""
+        cats_ag[i] = inst.category_assogestioni or ""
+        perf_1m[i] = inst.perf_1m_eur
+        perf_3m[i] = inst.perf_3m_eur
+        perf_6m[i] = inst.perf_6m_eur
+        perf_ytd[i] = inst.perf_ytd_eur
+        perf_1y[i] = inst.perf_1y_eur
+        perf_3y[i] = inst.perf_3y_eur
+        perf_5y[i] = inst.perf_5y_eur
+        perf_7y[i] = inst.perf_7y_eur
+        perf_9y[i] = inst.perf_9y_eur
+        perf_10y[i] = inst.perf_10y_eur
+        vol_3y[i] = inst.volatility_3y
+        sharpe[i] = inst.sharpe_ratio_3y
+        sources[i] = ", ".join(inst.sources)
+        quality[i] = f"{inst.data_quality_score:.0f}%"
+
+    return pd.DataFrame({
+        "Nome": names,
+        "ISIN": isins,
+        "Tipo": pd.Categorical(types),
+        "Valuta": pd.Categorical(currencies),
+        "Distribuzione": pd.Categorical(distributions),
+        "Cat. Morningstar": pd.Categorical(cats_ms),
+        "Cat. Assogestioni": pd.Categorical(cats_ag),
+        "Perf. 1m": perf_1m,
+        "Perf. 3m": perf_3m,
+        "Perf. 6m": perf_6m,
+        "Perf. YTD": perf_ytd,
+        "Perf. 1a": perf_1y,
+        "Perf. 3a": perf_3y,
+        "Perf. 5a": perf_5y,
+        "Perf. 7a": perf_7y,
+        "Perf. 9a": perf_9y,
+        "Perf. 10a": perf_10y,
+        "Volatilita' 3a": vol_3y,
+        "Sharpe 3a": sharpe,
+        "Fonti": pd.Categorical(sources),
+        "Qualita'": quality,
+    }, copy=False)
@@ -18,7 +18,7 @@ from core.models import (
 )
 from orchestrator.search_engine import SearchEngine
 from aggregator.data_merger import DataMerger
-from config import CATEGORY_MAPPING
+from config import CATEGORY_MAPPING, MORNINGSTAR_TO_ASSOGESTIONI
 
 logger = logging.getLogger(__name__)
 
@@ -360,12 +360,12 @@ class ComparisonEngine:
         # Se nessun match, prova con mapping categorie
         if not filtered and category_type == "morningstar":
             # Cerca nel mapping inverso (Morningstar -> Assogestioni)
-            for asso_cat, ms_cats in CATEGORY_MAPPING.items():
-                if category in ms_cats:
-                    for inst in universe:
-                        inst_category = inst.category_morningstar
-                        if inst_category and asso_cat.lower() in inst_category.lower():
-                            filtered.append(inst)
+            for asso_cat in MORNINGSTAR_TO_ASSOGESTIONI.get(category, ()):
+                asso_lower = asso_cat.lower()
+                for inst in universe:
+                    inst_category = inst.category_morningstar
+                    if inst_category and asso_lower in inst_category.lower():
+                        filtered.append(inst)
 
         return filtered
 
@@ -9,6 +9,8 @@ from threading import Lock
 from typing import Dict
 import logging
 
+from config import config
+
 logger = logging.getLogger(__name__)
 
 
@@ -22,17 +24,22 @@ class RateLimiter:
     """
 
     def __init__(self):
-        self._locks: Dict[str, Lock] = defaultdict(Lock)
         self._last_request: Dict[str, float] = defaultdict(float)
 
-        # Rate limits per fonte (seconds between requests)
-        # Increased to 2.0s to avoid triggering anti-bot measures on cloud deployments
+        # Rate limits per fonte (seconds between requests), da config:
+        # default 2.0s, sovrascrivibili con le variabili *_RATE_LIMIT
         self.limits = {
-            "justetf": 2.0,       # 0.5 req/sec (conservative)
-            "morningstar": 2.0,   # 0.5 req/sec (was 0.5, too aggressive)
-            "investiny": 2.0,     # 0.5 req/sec (conservative)
+            name: scraper.rate_limit
+            for name, scraper in config.scrapers.items()
         }
 
+        # Lock delle fonti note creati subito: i thread del preload
+        # condividono lo stesso lock per fonte fin dalla prima richiesta.
+        # Le fonti non configurate ricevono un lock alla prima richiesta.
+        self._locks: Dict[str, Lock] = defaultdict(
+            Lock, {source: Lock() for source in self.limits}
+        )
+
     def wait(self, source: str) -> None:
         """
         Attende se necessario per rispettare il rate limit.
@@ -91,6 +98,7 @@ class RateLimiter:
 
 # Singleton instance
 _rate_limiter: RateLimiter = None
+_rate_limiter_lock = Lock()
 
 
 def get_rate_limiter() -> RateLimiter:
@@ -102,5 +110,8 @@ def get_rate_limiter() -> RateLimiter:
     """
     global _rate_limiter
     if _rate_limiter is None:
-        _rate_limiter = RateLimiter()
+        # Double-checked locking: più thread possono chiederlo insieme
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = RateLimiter()
     return _rate_limiter
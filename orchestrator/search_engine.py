@@ -3,8 +3,12 @@ Search Engine - Orchestratore principale per ricerche multi-fonte.
 
 Coordina gli scraper, gestisce ricerche parallele e aggrega i risultati.
 """
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Optional, Callable, Dict
+from copy import deepcopy
+from typing import List, Optional, Callable, Dict, Tuple
+from time import time
+import json
 import logging
 
 from scrapers.base import BaseDataSource
@@ -14,9 +18,13 @@ from scrapers.investiny_scraper import InvestinyScraper
 from orchestrator.rate_limiter import get_rate_limiter
 from aggregator.data_merger import DataMerger
 from core.models import SearchCriteria, AggregatedInstrument, InstrumentType
+from config import config
 
 logger = logging.getLogger(__name__)
 
+# Numero massimo di ricerche tenute in cache
+SEARCH_CACHE_MAX_ENTRIES: int = 64
+
 # Type alias
 ProgressCallback = Callable[[float, str], None]
 
@@ -43,6 +51,11 @@ class SearchEngine:
         self.max_workers = max_workers
         self.merger = DataMerger()
 
+        # Cache risultati in ordine di inserimento:
+        # {chiave criteri: (timestamp, risultati)}
+        self._search_cache: Dict[str, Tuple[float, List[AggregatedInstrument]]] = OrderedDict()
+        self.cache_ttl = config.cache_ttl
+
         # Inizializza scrapers
         self.scrapers: Dict[str, BaseDataSource] = {
             "justetf": JustETFScraper(),
@@ -73,6 +86,21 @@ class SearchEngine:
         if sources is None:
             sources = list(self.scrapers.keys())
 
+        # Criteri identici entro il TTL: nessuno scraping, risultati dalla cache
+        cache_key = self._cache_key(criteria, sources)
+        cached = self._search_cache.get(cache_key)
+        if cached is not None:
+            if time() - cached[0] < self.cache_ttl:
+                logger.info("Search cache hit")
+                self._update_progress(
+                    progress_callback,
+                    1.0,
+                    f"Completato: {len(cached[1])} strumenti trovati (cache)"
+                )
+                # Copia: i chiamanti possono modificare gli strumenti
+                return deepcopy(cached[1])
+            del self._search_cache[cache_key]
+
         # Filtra fonti in base ai tipi strumento richiesti
         active_sources = self._filter_sources_by_type(sources, criteria.instrument_types)
 
@@ -84,6 +112,7 @@ class SearchEngine:
 
         all_records = []
         source_results: Dict[str, List] = {}
+        failed_sources: List[str] = []
 
         # Esegui ricerche in parallelo
         with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
@@ -117,6 +146,7 @@ class SearchEngine:
                 except Exception as e:
                     logger.error(f"{source_name} failed: {e}")
                     source_results[source_name] = []
+                    failed_sources.append(source_name)
 
         self._update_progress(progress_callback, 0.7, "Aggregazione risultati...")
 
@@ -139,8 +169,51 @@ class SearchEngine:
             f"Completato: {len(aggregated)} strumenti trovati"
         )
 
+        # Risultati parziali (almeno una fonte in errore) non vanno in cache:
+        # la prossima ricerca identica riprova tutte le fonti
+        if failed_sources:
+            logger.info(f"Search not cached, failed sources: {failed_sources}")
+        else:
+            self._store_in_cache(cache_key, aggregated)
+
         return aggregated
 
+    def _store_in_cache(
+        self,
+        cache_key: str,
+        results: List[AggregatedInstrument]
+    ) -> None:
+        """
+        Salva i risultati in cache (una copia), eliminando le voci scadute
+        e, oltre SEARCH_CACHE_MAX_ENTRIES, le più vecchie.
+        """
+        now = time()
+        cache = self._search_cache
+        cache.pop(cache_key, None)
+
+        # Stesso TTL per tutte le voci: le scadute sono in testa
+        while cache:
+            timestamp, _ = next(iter(cache.values()))
+            if now - timestamp < self.cache_ttl:
+                break
+            cache.popitem(last=False)
+        while len(cache) >= SEARCH_CACHE_MAX_ENTRIES:
+            cache.popitem(last=False)
+
+        cache[cache_key] = (now, deepcopy(results))
+
+    @staticmethod
+    def _cache_key(criteria: SearchCriteria, sources: List[str]) -> str:
+        """Chiave canonica (JSON ordinato) per criteri + fonti."""
+        return json.dumps(
+            {"criteria": criteria.to_dict(), "sources": sorted(sources)},
+            sort_keys=True
+        )
+
+    def clear_cache(self) -> None:
+        """Svuota la cache dei risultati di ricerca."""
+        self._search_cache.clear()
+
     def _filter_sources_by_type(
         self,
         sources: List[str],
@@ -221,23 +294,45 @@ class SearchEngine:
         """
         all_records = []
         total = len(isins) * len(self.scrapers)
-        current = 0
+        if total == 0:
+            return []
+        done = 0
 
-        for isin in isins:
-            for source_name, scraper in self.scrapers.items():
+        def lookup_source(source_name: str, scraper: BaseDataSource) -> List:
+            # Le fonti lavorano in parallelo; dentro ogni fonte gli ISIN restano
+            # sequenziali, così il rate limiter per-fonte continua a valere
+            records = []
+            for isin in isins:
                 try:
                     self.rate_limiter.wait(source_name)
                     record = scraper.get_by_isin(isin)
                     if record:
-                        all_records.append(record)
+                        records.append(record)
                 except Exception as e:
                     logger.warning(f"Failed to get {isin} from {source_name}: {e}")
+            return records
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(lookup_source, source_name, scraper): source_name
+                for source_name, scraper in self.scrapers.items()
+            }
+            # Progress dal thread chiamante, a ogni fonte completata: il
+            # callback può aggiornare widget legati al thread principale
+            for future in as_completed(futures):
+                source_name = futures[future]
+                try:
+                    records = future.result()
+                    all_records.extend(records)
+                    logger.info(f"{source_name}: found {len(records)} records")
+                except Exception as e:
+                    logger.error(f"{source_name} lookup failed: {e}")
 
-                current += 1
+                done += len(isins)
                 self._update_progress(
                     progress_callback,
-                    current / total,
-                    f"Lookup {isin}..."
+                    done / total,
+                    f"[{source_name}] Lookup completato"
                 )
 
         return self.merger.merge(all_records, self.source_priority)
@@ -6,6 +6,7 @@ Definisce l'interfaccia comune che tutti gli scraper devono implementare.
 from abc import ABC, abstractmethod
 from typing import List, Optional, Callable
 from time import time, sleep
+from threading import Lock
 import logging
 
 from core.models import SourceRecord, SearchCriteria, InstrumentType
@@ -37,6 +38,9 @@ class BaseDataSource(ABC):
         self.rate_limit = rate_limit
         self.logger = logging.getLogger(f"scraper.{name}")
         self._last_request_time: float = 0.0
+        # Un'istanza può essere condivisa tra thread (preload ETF): il lock
+        # serializza l'attesa, così le richieste restano distanziate
+        self._rate_limit_lock = Lock()
 
     @property
     @abstractmethod
@@ -116,13 +120,14 @@ class BaseDataSource(ABC):
             return False
 
     def _wait_rate_limit(self) -> None:
-        """Attende per rispettare il rate limit."""
-        elapsed = time() - self._last_request_time
-        if elapsed < self.rate_limit:
-            wait_time = self.rate_limit - elapsed
-            self.logger.debug(f"Rate limiting: waiting {wait_time:.2f}s")
-            sleep(wait_time)
-        self._last_request_time = time()
+        """Attende per rispettare il rate limit (thread-safe)."""
+        with self._rate_limit_lock:
+            elapsed = time() - self._last_request_time
+            if elapsed < self.rate_limit:
+                wait_time = self.rate_limit - elapsed
+                self.logger.debug(f"Rate limiting: waiting {wait_time:.2f}s")
+                sleep(wait_time)
+            self._last_request_time = time()
 
     def _update_progress(
         self,
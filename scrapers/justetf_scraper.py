@@ -7,6 +7,7 @@ per recuperare dati su oltre 3400 ETF.
 import pandas as pd
 from typing import List, Optional
 from time import time
+from threading import Lock
 from datetime import datetime
 import logging
 
@@ -42,6 +43,7 @@ class JustETFScraper(BaseDataSource):
         self._overview_cache: Optional[pd.DataFrame] = None
         self._cache_timestamp: Optional[float] = None
         self._cache_ttl: int = 3600  # 1 ora
+        self._overview_lock = Lock()
 
     @property
     def supported_types(self) -> List[InstrumentType]:
@@ -53,39 +55,48 @@ class JustETFScraper(BaseDataSource):
 
         La funzione load_overview() di justetf-scraping è lenta
         (fa multiple richieste), quindi implementiamo cache locale.
+        L'istanza può essere condivisa tra thread (preload ETF): il lock
+        fa sì che l'overview scaduta venga ricaricata da un solo thread.
         """
-        now = time()
-
-        # Verifica cache
-        if (
-            not force_refresh
-            and self._overview_cache is not None
-            and self._cache_timestamp
-            and (now - self._cache_timestamp) < self._cache_ttl
-        ):
+        if not force_refresh and self._overview_is_fresh():
             self.logger.debug("Using cached JustETF overview")
             return self._overview_cache
 
-        self.logger.info("Loading JustETF overview (this may take a while)...")
+        with self._overview_lock:
+            # Un altro thread può averla ricaricata mentre si attendeva il lock
+            if not force_refresh and self._overview_is_fresh():
+                return self._overview_cache
 
-        try:
-            import justetf_scraping
+            self.logger.info("Loading JustETF overview (this may take a while)...")
 
-            # Carica overview con dati arricchiti
-            df = justetf_scraping.load_overview(enrich=True)
+            now = time()
 
-            self._overview_cache = df
-            self._cache_timestamp = now
+            try:
+                import justetf_scraping
 
-            self.logger.info(f"Loaded {len(df)} ETFs from JustETF")
-            return df
+                # Carica overview con dati arricchiti
+                df = justetf_scraping.load_overview(enrich=True)
 
-        except ImportError:
-            self.logger.error("justetf-scraping not installed. Run: pip install justetf-scraping")
-            raise
-        except Exception as e:
-            self.logger.error(f"Failed to load JustETF overview: {e}")
-            raise
+                self._overview_cache = df
+                self._cache_timestamp = now
+
+                self.logger.info(f"Loaded {len(df)} ETFs from JustETF")
+                return df
+
+            except ImportError:
+                self.logger.error("justetf-scraping not installed. Run: pip install justetf-scraping")
+                raise
+            except Exception as e:
+                self.logger.error(f"Failed to load JustETF overview: {e}")
+                raise
+
+    def _overview_is_fresh(self) -> bool:
+        """True se l'overview in cache esiste e non è scaduta."""
+        return (
+            self._overview_cache is not None
+            and bool(self._cache_timestamp)
+            and (time() - self._cache_timestamp) < self._cache_ttl
+        )
 
     def _map_distribution(self, use_of_profits: str) -> DistributionPolicy:
         """Mappa il campo use_of_profits di JustETF."""
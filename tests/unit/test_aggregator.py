@@ -147,3 +147,48 @@ class TestDataMerger:
         # Dovrebbe prendere return_1y da morningstar e return_3y da justetf
         assert result[0].perf_1y_eur == 15.0
         assert result[0].perf_3y_eur == 10.0
+
+    def test_field_fallback_across_sources(self, merger, source_priority):
+        """Test che categorie, distribuzione e tipo vengano presi dalla prima fonte valorizzata."""
+        records = [
+            SourceRecord(
+                isin="IE00B4L5Y983",
+                name="Record Morningstar",
+                source="morningstar",
+                category_morningstar="Test Category",
+            ),
+            SourceRecord(
+                isin="IE00B4L5Y983",
+                name="Record JustETF",
+                source="justetf",
+                instrument_type=InstrumentType.ETF,
+                distribution=DistributionPolicy.ACCUMULATING,
+                domicile="Ireland",
+                category_morningstar="Other Category",
+                category_assogestioni="AZ. INTERNAZIONALI",
+            ),
+        ]
+
+        result = merger.merge(records, source_priority)
+
+        assert result[0].category_morningstar == "Test Category"
+        assert result[0].category_assogestioni == "AZ. INTERNAZIONALI"
+        assert result[0].domicile == "Ireland"
+        assert result[0].distribution == DistributionPolicy.ACCUMULATING
+        assert result[0].instrument_type == InstrumentType.ETF
+
+    def test_merge_df_matches_merge(self, merger, source_priority, multiple_source_records):
+        """Test che la variante pandas produca gli stessi dati di merge()."""
+        pytest.importorskip("pandas")
+
+        expected = {r.isin: r for r in merger.merge(multiple_source_records, source_priority)}
+        result = {r.isin: r for r in merger.merge_df(multiple_source_records, source_priority)}
+
+        assert result.keys() == expected.keys()
+        for isin, inst in result.items():
+            assert inst.name == expected[isin].name
+            assert inst.perf_1y_eur == expected[isin].perf_1y_eur
+            assert inst.perf_3y_eur == expected[isin].perf_3y_eur
+            assert inst.category_morningstar == expected[isin].category_morningstar
+            assert sorted(inst.sources) == sorted(expected[isin].sources)
+            assert inst.data_quality_score == expected[isin].data_quality_score
@@ -0,0 +1,269 @@
+"""
+Test per il confronto universo vs ETF.
+"""
+import math
+import pickle
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from config import PERFORMANCE_PERIOD_CODES
+from core.comparison_calculator import (
+    ComparisonReport,
+    ComparisonResult,
+    compare_universe_vs_etf,
+)
+from core.models import UniverseInstrument
+from core.universe_loader import UniverseArrays
+
+
+def make_instrument(index: int, **performance) -> UniverseInstrument:
+    """Crea uno strumento dell'universo con ISIN progressivo."""
+    return UniverseInstrument(
+        isin=f"IE{index:010d}", name=f"Fondo {index}", **performance
+    )
+
+
+def make_result(index: int, delta) -> ComparisonResult:
+    """Crea un risultato di confronto con il delta indicato."""
+    return ComparisonResult(
+        instrument=make_instrument(index),
+        etf_performance=0.10,
+        fund_performance=None if delta is None else 0.10 + delta,
+        delta=delta,
+        beats_etf=None if delta is None else delta > 0,
+    )
+
+
+def make_report(deltas) -> ComparisonReport:
+    """Crea un report con un risultato per delta, ISIN IE..00, IE..01, ..."""
+    return ComparisonReport(
+        etf_benchmark=make_instrument(99, perf_1y=0.10),
+        period="1y",
+        period_label="1 anno",
+        results=[make_result(i, d) for i, d in enumerate(deltas)],
+    )
+
+
+def isins(results):
+    """ISIN dei risultati, nell'ordine."""
+    return [r.instrument.isin for r in results]
+
+
+class TestComparisonReportCache:
+    """I valori derivati seguono ogni riassegnazione di results."""
+
+    def test_results_are_frozen_into_a_tuple(self):
+        """La lista passata al report viene copiata in una tupla."""
+        results = [make_result(0, 0.1), make_result(1, 0.2)]
+        report = ComparisonReport(
+            etf_benchmark=make_instrument(99, perf_1y=0.10),
+            period="1y",
+            period_label="1 anno",
+            results=results,
+        )
+        assert isinstance(report.results, tuple)
+
+        # Modificare la lista originale non altera il report
+        results.reverse()
+        results.append(make_result(2, -0.3))
+        assert report.total_funds == 2
+        assert report.best_performer.instrument.isin == "IE0000000001"
+
+    def test_reordered_results_invalidate_sort_and_best(self):
+        """Dopo un riordino best/worst e ordinamento si aggiornano."""
+        report = make_report([0.2, 0.2, None, -0.1])
+        assert report.best_performer.instrument.isin == "IE0000000000"
+        assert isins(report.get_sorted_results()) == [
+            "IE0000000000", "IE0000000001", "IE0000000003", "IE0000000002",
+        ]
+
+        report.results = report.results[::-1]
+
+        # A parità di delta vale il primo nel nuovo ordine
+        assert report.best_performer.instrument.isin == "IE0000000001"
+        assert report.worst_performer.instrument.isin == "IE0000000003"
+        assert isins(report.get_sorted_results()) == [
+            "IE0000000001", "IE0000000000", "IE0000000003", "IE0000000002",
+        ]
+
+    def test_item_replacement_invalidates_aggregates(self):
+        """Sostituire un elemento ricalcola medie e conteggi."""
+        report = make_report([0.1, 0.2])
+        assert report.avg_delta == pytest.approx(0.15)
+
+        report.results = (make_result(5, 0.3), *report.results[1:])
+
+        assert report.avg_delta == pytest.approx(0.25)
+        assert report.funds_beating_etf == 2
+        assert report.best_performer.instrument.isin == "IE0000000005"
+
+    def test_append_and_reassign_list(self):
+        """Estendere o sostituire results aggiorna i valori derivati."""
+        report = make_report([0.1, -0.1])
+        assert (report.funds_beating_etf, report.funds_no_data) == (1, 0)
+
+        report.results = [*report.results, make_result(2, None)]
+        assert (report.funds_beating_etf, report.funds_no_data) == (1, 1)
+
+        # Una lista riassegnata viene congelata al primo uso
+        new_results = [make_result(3, -0.2)]
+        report.results = new_results
+        assert report.funds_beating_etf == 0
+        new_results.append(make_result(4, 0.5))
+        assert report.avg_delta == pytest.approx(-0.2)
+        assert isins(report.get_sorted_results()) == ["IE0000000003"]
+
+    def test_invalidate_after_in_place_change(self):
+        """Dopo la modifica in place di un risultato basta _invalidate()."""
+        report = make_report([0.1, 0.2])
+        assert report.best_performer.instrument.isin == "IE0000000001"
+
+        report.results[0].delta = 0.5
+        report._invalidate()
+
+        assert report.best_performer.instrument.isin == "IE0000000000"
+        assert report.avg_delta == pytest.approx(0.35)
+
+    def test_sorted_results_is_a_copy(self):
+        """La lista restituita può essere modificata senza effetti sul report."""
+        report = make_report([0.1, 0.3, 0.2])
+        sorted_results = report.get_sorted_results()
+        sorted_results.clear()
+        assert isins(report.get_sorted_results(ascending=True)) == [
+            "IE0000000000", "IE0000000002", "IE0000000001",
+        ]
+        assert len(report.get_sorted_results()) == 3
+
+    def test_cache_survives_pickle(self):
+        """Un report deserializzato (st.cache_data) resta coerente."""
+        report = make_report([0.1, None, 0.3])
+        report.get_sorted_results()
+        copy = pickle.loads(pickle.dumps(report))
+
+        assert copy.best_performer is copy.results[2]
+        assert isins(copy.get_sorted_results()) == isins(report.get_sorted_results())
+        copy.results = copy.results[:1]
+        assert copy.funds_no_data == 0
+
+    def test_empty_report(self):
+        """Report senza risultati: aggregati vuoti."""
+        report = make_report([])
+        assert report.avg_delta is None
+        assert report.best_performer is None
+        assert report.get_sorted_results() == []
+
+
+def scalar_comparison(universe, etf, period):
+    """Confronto riga per riga, come calcolato prima della versione vettoriale."""
+    etf_perf = etf.get_performance_by_period(period)
+    rows = []
+    for fund in universe:
+        if fund.isin == etf.isin:
+            continue
+        fund_perf = fund.get_performance_by_period(period)
+        if etf_perf is not None and fund_perf is not None:
+            delta = round(fund_perf - etf_perf, 4)
+            beats = delta > 0
+        else:
+            delta = None
+            beats = None
+        rows.append((fund.isin, etf_perf, fund_perf, delta, beats))
+    return rows
+
+
+def result_rows(report):
+    """Risultati del report come tuple confrontabili con scalar_comparison."""
+    return [
+        (r.instrument.isin, r.etf_performance, r.fund_performance, r.delta, r.beats_etf)
+        for r in report.results
+    ]
+
+
+@pytest.fixture
+def etf():
+    """ETF benchmark con 1y e 3y, senza dati sugli altri periodi."""
+    return make_instrument(99, perf_1y=0.1, perf_3y=0.3)
+
+
+@pytest.fixture
+def universe(etf):
+    """Fondi con delta da arrotondare, parità, dati mancanti e l'ETF stesso."""
+    return [
+        make_instrument(0, perf_1y=0.12345, perf_3y=0.1 + 0.2),
+        make_instrument(1, perf_1y=0.10005, perf_3y=0.30004),
+        etf,
+        make_instrument(2, perf_1y=0.100049999, perf_3y=None),
+        make_instrument(3, perf_1y=0.1, perf_3y=0.29995),
+        make_instrument(4, perf_1y=None, perf_3y=0.5),
+        make_instrument(5, perf_1y=0.0245, perf_3y=-0.0245),
+        make_instrument(6, perf_1y=0.12345, perf_3y=0.30005),
+    ]
+
+
+class TestCompareUniverseVsEtf:
+    """Il confronto vettoriale coincide con il calcolo riga per riga."""
+
+    @pytest.mark.parametrize("period", PERFORMANCE_PERIOD_CODES)
+    @pytest.mark.parametrize("with_arrays", [False, True])
+    def test_matches_scalar_baseline(self, universe, etf, period, with_arrays):
+        """Stessi valori, arrotondamento a 4 decimali e tipi Python."""
+        arrays = UniverseArrays.from_instruments(universe) if with_arrays else None
+        report = compare_universe_vs_etf(universe, etf, period, "label", arrays=arrays)
+
+        expected = scalar_comparison(universe, etf, period)
+        assert result_rows(report) == expected
+        for _, _, fund_perf, delta, beats in result_rows(report):
+            assert fund_perf is None or type(fund_perf) is float
+            assert delta is None or type(delta) is float
+            assert beats is None or type(beats) is bool
+
+    @pytest.mark.parametrize("period", ["1y", "3y", "5y"])
+    def test_aggregates_match_fresh_report(self, universe, etf, period):
+        """Gli aggregati sui delta precalcolati coincidono con un report nuovo."""
+        arrays = UniverseArrays.from_instruments(universe)
+        report = compare_universe_vs_etf(universe, etf, period, "label", arrays=arrays)
+        fresh = ComparisonReport(
+            etf_benchmark=etf, period=period, period_label="label",
+            results=list(report.results),
+        )
+
+        assert report.funds_beating_etf == fresh.funds_beating_etf
+        assert report.funds_not_beating_etf == fresh.funds_not_beating_etf
+        assert report.funds_no_data == fresh.funds_no_data
+        for attr in ("avg_delta", "avg_delta_beating"):
+            a, b = getattr(report, attr), getattr(fresh, attr)
+            assert a == b or (a is None and b is None)
+        assert report.best_performer is fresh.best_performer
+        assert report.worst_performer is fresh.worst_performer
+        assert isins(report.get_sorted_results()) == isins(fresh.get_sorted_results())
+
+    def test_rounding_and_classification(self, universe, etf):
+        """Delta arrotondati come round(); un delta arrotondato a 0 non batte l'ETF."""
+        report = compare_universe_vs_etf(universe, etf, "3y", "3 anni")
+        by_isin = {r.instrument.isin: r for r in report.results}
+
+        assert etf.isin not in by_isin
+        assert by_isin["IE0000000000"].delta == round(0.1 + 0.2 - 0.3, 4)
+        assert by_isin["IE0000000000"].beats_etf is False
+        assert by_isin["IE0000000001"].delta == 0.0
+        assert by_isin["IE0000000001"].beats_etf is False
+        assert by_isin["IE0000000002"].delta is None
+        assert by_isin["IE0000000002"].beats_etf is None
+        assert by_isin["IE0000000004"].delta == 0.2
+        assert math.isclose(report.avg_delta, sum(
+            r.delta for r in report.results if r.delta is not None
+        ) / 6)
+
+    def test_etf_without_period_data(self, universe, etf):
+        """Senza performance dell'ETF nel periodo nessun fondo ha delta."""
+        report = compare_universe_vs_etf(
+            universe, etf, "10y", "10 anni",
+            arrays=UniverseArrays.from_instruments(universe),
+        )
+        assert report.total_funds == len(universe) - 1
+        assert report.funds_no_data == report.total_funds
+        assert report.avg_delta is None
+        assert report.best_performer is None
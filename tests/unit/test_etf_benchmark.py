@@ -0,0 +1,102 @@
+"""
+Test per la cache ETF locale.
+"""
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import core.etf_benchmark as etf_benchmark
+from core.etf_benchmark import (
+    add_etf_to_cache,
+    clear_etf_cache,
+    find_etf_in_cache,
+    get_etf_cache_status,
+)
+from core.models import UniverseInstrument
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Orologio controllato dal test, su una cache ETF vuota."""
+    now = [1_000_000.0]
+    monkeypatch.setattr(etf_benchmark, "time", lambda: now[0])
+    clear_etf_cache()
+    yield now
+    clear_etf_cache()
+
+
+def make_etf(isin: str) -> UniverseInstrument:
+    """Crea un ETF con performance a 1 anno."""
+    return UniverseInstrument(isin=isin, name=f"ETF {isin}", perf_1y=0.1)
+
+
+class TestEtfCache:
+    """Test per scadenza e ordine delle voci nella cache ETF."""
+
+    def test_lookup_is_canonical(self, clock):
+        """ISIN con spazi o minuscole trovano la stessa voce."""
+        etf = make_etf("IE00B4L5Y983")
+        add_etf_to_cache(" ie00b4l5y983 ", etf)
+        assert find_etf_in_cache("IE00B4L5Y983") is etf
+        assert find_etf_in_cache("ie00b4l5y983") is etf
+        assert get_etf_cache_status()["isins"] == ["IE00B4L5Y983"]
+
+    def test_entry_expires_after_ttl(self, clock):
+        """Una voce è valida fino al TTL e poi viene rimossa al lookup."""
+        add_etf_to_cache("IE00B4L5Y983", make_etf("IE00B4L5Y983"))
+
+        clock[0] += etf_benchmark._cache_ttl - 1
+        assert find_etf_in_cache("IE00B4L5Y983") is not None
+
+        clock[0] += 1
+        assert find_etf_in_cache("IE00B4L5Y983") is None
+        assert "IE00B4L5Y983" not in etf_benchmark._etf_cache
+
+    def test_status_prunes_expired_entries(self, clock):
+        """Lo stato elimina le voci scadute in testa e riporta la più vecchia."""
+        add_etf_to_cache("IE0000000001", make_etf("IE0000000001"))
+        clock[0] += 3600
+        add_etf_to_cache("IE0000000002", make_etf("IE0000000002"))
+        clock[0] += 3600
+        add_etf_to_cache("IE0000000003", make_etf("IE0000000003"))
+
+        status = get_etf_cache_status()
+        assert status["count"] == 3
+        assert status["expires_in_minutes"] == (etf_benchmark._cache_ttl - 7200) // 60
+
+        # Scade solo la prima voce
+        clock[0] += etf_benchmark._cache_ttl - 7200
+        status = get_etf_cache_status()
+        assert status["isins"] == ["IE0000000002", "IE0000000003"]
+        assert status["expires_in_minutes"] == 60
+
+        # Scadono tutte
+        clock[0] += 7200
+        assert get_etf_cache_status() == {
+            "count": 0, "isins": [], "expires_in_minutes": None,
+        }
+        assert len(etf_benchmark._etf_cache) == 0
+
+    def test_readd_moves_entry_to_end(self, clock):
+        """Un ETF ricaricato diventa la voce più recente e non scade con la vecchia."""
+        add_etf_to_cache("IE0000000001", make_etf("IE0000000001"))
+        clock[0] += 3600
+        add_etf_to_cache("IE0000000002", make_etf("IE0000000002"))
+        clock[0] += 3600
+        refreshed = make_etf("IE0000000001")
+        add_etf_to_cache("IE0000000001", refreshed)
+        assert list(etf_benchmark._etf_cache) == ["IE0000000002", "IE0000000001"]
+
+        # Alla scadenza della seconda voce resta solo quella ricaricata
+        clock[0] += etf_benchmark._cache_ttl - 3600
+        assert get_etf_cache_status()["isins"] == ["IE0000000001"]
+        assert find_etf_in_cache("IE0000000001") is refreshed
+
+    def test_clear_cache(self, clock):
+        """Svuotare la cache rimuove tutte le voci."""
+        add_etf_to_cache("IE0000000001", make_etf("IE0000000001"))
+        clear_etf_cache()
+        assert find_etf_in_cache("IE0000000001") is None
+        assert get_etf_cache_status()["count"] == 0
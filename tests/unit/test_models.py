@@ -88,6 +88,12 @@ class TestSearchCriteria:
         assert "currencies" in result
         assert result["currencies"] == ["EUR"]
 
+    def test_from_dict_roundtrip(self, sample_search_criteria):
+        """Test ricostruzione da dict serializzato."""
+        data = sample_search_criteria.to_dict()
+
+        assert SearchCriteria.from_dict(data) == sample_search_criteria
+
     def test_has_category_filter_true(self, sample_search_criteria):
         """Test has_category_filter con categorie."""
         assert sample_search_criteria.has_category_filter() is True
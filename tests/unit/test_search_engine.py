@@ -0,0 +1,155 @@
+"""
+Test per la cache dei risultati del SearchEngine.
+"""
+import pytest
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import orchestrator.search_engine as search_engine
+from orchestrator.search_engine import SearchEngine
+from core.models import SearchCriteria, InstrumentType
+
+
+class FakeSource:
+    """Fonte dati finta: conta le ricerche e può fallire a comando."""
+
+    supported_types = [InstrumentType.ETF, InstrumentType.FUND]
+
+    def __init__(self, records):
+        self.records = records
+        self.calls = 0
+        self.fail = False
+
+    def search(self, criteria, progress_callback=None):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError("fonte non raggiungibile")
+        return list(self.records)
+
+    def get_by_isin(self, isin):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError("fonte non raggiungibile")
+        return next((r for r in self.records if r.isin == isin), None)
+
+
+class NoWaitRateLimiter:
+    """Rate limiter senza attese, per non rallentare i test."""
+
+    def wait(self, source):
+        pass
+
+
+@pytest.fixture
+def engine(sample_source_record):
+    """SearchEngine con una sola fonte finta."""
+    engine = SearchEngine()
+    engine.scrapers = {"justetf": FakeSource([sample_source_record])}
+    return engine
+
+
+class TestSearchCache:
+    """Test per la cache delle ricerche."""
+
+    def test_identical_search_is_cached(self, engine):
+        """Una ricerca identica entro il TTL non interroga le fonti."""
+        criteria = SearchCriteria()
+        first = engine.search(criteria)
+        second = engine.search(criteria)
+        assert engine.scrapers["justetf"].calls == 1
+        assert [i.isin for i in second] == [i.isin for i in first]
+
+    def test_failed_source_is_not_cached(self, engine):
+        """Risultati parziali per errore di una fonte non vanno in cache."""
+        source = engine.scrapers["justetf"]
+        source.fail = True
+        assert engine.search(SearchCriteria()) == []
+
+        source.fail = False
+        assert len(engine.search(SearchCriteria())) == 1
+        assert source.calls == 2
+
+    def test_cache_hit_returns_copies(self, engine):
+        """Modificare i risultati restituiti non altera la cache."""
+        criteria = SearchCriteria()
+        engine.search(criteria)
+        hit = engine.search(criteria)
+        hit[0].name = "Modificato"
+        hit.clear()
+
+        again = engine.search(criteria)
+        assert len(again) == 1
+        assert again[0].name != "Modificato"
+
+    def test_cache_is_bounded_and_pruned(self, engine, monkeypatch):
+        """Le voci scadute e quelle oltre il limite vengono eliminate."""
+        monkeypatch.setattr(search_engine, "SEARCH_CACHE_MAX_ENTRIES", 2)
+        now = [1000.0]
+        monkeypatch.setattr(search_engine, "time", lambda: now[0])
+
+        for period in ("1y", "3y", "5y"):
+            engine.search(SearchCriteria(performance_period=period))
+        assert len(engine._search_cache) == 2
+
+        now[0] += engine.cache_ttl
+        engine.search(SearchCriteria(performance_period="10y"))
+        assert len(engine._search_cache) == 1
+
+
+class TestEnrichByIsins:
+    """Test per il lookup di una lista di ISIN su tutte le fonti."""
+
+    @pytest.fixture
+    def engine(self, sample_source_record):
+        """SearchEngine con due fonti finte e nessuna attesa tra richieste."""
+        engine = SearchEngine()
+        engine.scrapers = {
+            "justetf": FakeSource([sample_source_record]),
+            "morningstar": FakeSource([sample_source_record]),
+        }
+        engine.rate_limiter = NoWaitRateLimiter()
+        return engine
+
+    def test_progress_reported_on_calling_thread(self, engine, sample_source_record):
+        """Il callback di progress gira solo nel thread chiamante, fino a 1.0."""
+        calls = []
+
+        def on_progress(progress, message):
+            calls.append((progress, threading.get_ident()))
+
+        results = engine.enrich_by_isins(
+            [sample_source_record.isin, "LU0000000000"], on_progress
+        )
+
+        assert [i.isin for i in results] == [sample_source_record.isin]
+        assert {thread for _, thread in calls} == {threading.get_ident()}
+        assert [progress for progress, _ in calls] == [0.5, 1.0]
+        assert engine.scrapers["justetf"].calls == 2
+
+    def test_one_failing_source(self, engine, sample_source_record):
+        """Una fonte in errore non blocca le altre né il progress."""
+        engine.scrapers["morningstar"].fail = True
+        calls = []
+
+        results = engine.enrich_by_isins(
+            [sample_source_record.isin],
+            lambda progress, message: calls.append(progress),
+        )
+
+        assert [i.isin for i in results] == [sample_source_record.isin]
+        assert engine.scrapers["morningstar"].calls == 1
+        assert calls[-1] == 1.0
+
+    def test_all_sources_failing(self, engine, sample_source_record):
+        """Con tutte le fonti in errore il risultato è vuoto."""
+        for source in engine.scrapers.values():
+            source.fail = True
+        assert engine.enrich_by_isins([sample_source_record.isin]) == []
+
+    def test_empty_isin_list(self, engine):
+        """Nessun ISIN: nessuna richiesta alle fonti."""
+        assert engine.enrich_by_isins([]) == []
+        assert engine.scrapers["justetf"].calls == 0
@@ -0,0 +1,160 @@
+"""
+Test per la vista colonnare dell'universo (UniverseArrays).
+
+Il percorso vettoriale deve dare gli stessi risultati del percorso
+sulla lista di strumenti.
+"""
+import numpy as np
+import pytest
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from config import PERFORMANCE_PERIOD_CODES
+from core.models import UniverseInstrument
+from core.universe_loader import (
+    UniverseArrays,
+    filter_by_performance,
+    group_by_category,
+    rank_by_performance,
+)
+
+
+@pytest.fixture
+def instruments():
+    """Universo con dati mancanti, parità di performance e categorie vuote."""
+    return [
+        UniverseInstrument(isin="IE0000000001", name="Alfa",
+                           category_morningstar="Azionari Globali",
+                           perf_1y=0.10, perf_3y=0.30, ter=0.002),
+        UniverseInstrument(isin="IE0000000002", name="Beta",
+                           category_morningstar="",
+                           perf_1y=0.05, var_3m=0.04),
+        UniverseInstrument(isin="IE0000000003",
+                           category_morningstar="Obbligazionari EUR",
+                           perf_1y=0.10, perf_3y=-0.02),
+        UniverseInstrument(isin="IE0000000004", name="Delta",
+                           perf_1y=None, perf_3y=0.30),
+        UniverseInstrument(isin="IE0000000005", name="Epsilon",
+                           category_morningstar="Azionari Globali",
+                           perf_1y=0.0, perf_3y=0.30),
+        UniverseInstrument(isin="IE0000000006", name="Zeta",
+                           category_morningstar="Obbligazionari EUR",
+                           perf_1y=-0.10),
+    ]
+
+
+@pytest.fixture
+def arrays(instruments):
+    """Vista colonnare allineata agli strumenti."""
+    return UniverseArrays.from_instruments(instruments)
+
+
+def isins(instruments):
+    """ISIN degli strumenti, nell'ordine."""
+    return [inst.isin for inst in instruments]
+
+
+class TestUniverseArrays:
+    """Test per la costruzione della vista colonnare."""
+
+    def test_columns_match_instruments(self, instruments, arrays):
+        """Ogni colonna riporta i valori degli strumenti, NaN se mancanti."""
+        assert len(arrays) == len(instruments)
+        assert list(arrays.isin) == isins(instruments)
+        # Nome assente: si usa l'ISIN
+        assert list(arrays.name) == [
+            "Alfa", "Beta", "IE0000000003", "Delta", "Epsilon", "Zeta",
+        ]
+        assert list(arrays.category) == [
+            "Azionari Globali", "", "Obbligazionari EUR", "",
+            "Azionari Globali", "Obbligazionari EUR",
+        ]
+        assert arrays.performance.dtype == np.float64
+
+        for period in PERFORMANCE_PERIOD_CODES:
+            expected = [inst.get_performance_by_period(period) for inst in instruments]
+            column = arrays.period(period)
+            for value, exp in zip(column, expected):
+                if exp is None:
+                    assert np.isnan(value)
+                else:
+                    assert value == exp
+
+        assert np.isnan(arrays.ter[1]) and arrays.ter[0] == 0.002
+        assert np.isnan(arrays.var_3m[0]) and arrays.var_3m[1] == 0.04
+
+    def test_subset_keeps_alignment(self, arrays):
+        """Il sottoinsieme per indici resta allineato su tutte le colonne."""
+        sub = arrays.subset(np.array([4, 1]))
+        assert list(sub.isin) == ["IE0000000005", "IE0000000002"]
+        assert list(sub.category) == ["Azionari Globali", ""]
+        assert list(sub.period("1y")) == [0.0, 0.05]
+
+    def test_empty_universe(self):
+        """Universo vuoto: array vuoti e filtri senza risultati."""
+        arrays = UniverseArrays.from_instruments([])
+        assert len(arrays) == 0
+        assert filter_by_performance([], "1y", min_value=0.0, arrays=arrays) == []
+        assert rank_by_performance([], "1y", arrays=arrays) == []
+        assert group_by_category([], arrays=arrays) == {}
+
+
+class TestArrayPathMatchesListPath:
+    """Il percorso con arrays= coincide con quello sulla lista."""
+
+    @pytest.mark.parametrize("period", PERFORMANCE_PERIOD_CODES)
+    @pytest.mark.parametrize("min_value, max_value", [
+        (None, None),
+        (0.0, None),
+        (None, 0.05),
+        (0.05, 0.10),
+        (0.5, None),
+    ])
+    def test_filter_by_performance(self, instruments, arrays, period,
+                                   min_value, max_value):
+        """Stessi strumenti, nello stesso ordine, inclusi i bordi."""
+        expected = filter_by_performance(instruments, period, min_value, max_value)
+        actual = filter_by_performance(
+            instruments, period, min_value, max_value, arrays=arrays
+        )
+        assert isins(actual) == isins(expected)
+
+    @pytest.mark.parametrize("period", ["1y", "3y", "10y"])
+    @pytest.mark.parametrize("ascending", [False, True])
+    @pytest.mark.parametrize("top_n", [None, 2, 10])
+    def test_rank_by_performance(self, instruments, arrays, period,
+                                 ascending, top_n):
+        """Stesso ordinamento, mancanti esclusi e parità in ordine originale."""
+        expected = rank_by_performance(instruments, period, ascending, top_n)
+        actual = rank_by_performance(
+            instruments, period, ascending, top_n, arrays=arrays
+        )
+        assert isins(actual) == isins(expected)
+
+    def test_rank_ties_keep_original_order(self, instruments, arrays):
+        """A parità di performance l'ordinamento è stabile in entrambi i versi."""
+        ranked = rank_by_performance(instruments, "3y", arrays=arrays)
+        assert isins(ranked) == [
+            "IE0000000001", "IE0000000004", "IE0000000005", "IE0000000003",
+        ]
+        ranked = rank_by_performance(instruments, "3y", ascending=True, arrays=arrays)
+        assert isins(ranked) == [
+            "IE0000000003", "IE0000000001", "IE0000000004", "IE0000000005",
+        ]
+
+    def test_group_by_category(self, instruments, arrays):
+        """Stessi gruppi nello stesso ordine; "" e None in "Senza Categoria"."""
+        expected = group_by_category(instruments)
+        actual = group_by_category(instruments, arrays=arrays)
+        assert list(actual) == list(expected)
+        for label in expected:
+            assert isins(actual[label]) == isins(expected[label])
+        assert isins(actual["Senza Categoria"]) == ["IE0000000002", "IE0000000004"]
+
+    def test_group_by_category_keeps_categories(self, instruments, arrays):
+        """Il raggruppamento non altera le categorie della vista colonnare."""
+        group_by_category(instruments, arrays=arrays)
+        assert "" in list(arrays.category.categories)
+        assert "Senza Categoria" not in list(arrays.category.categories)